@@ -1,13 +1,31 @@
 # app/main.py
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.routers import repo_analyzer
+from fastapi.responses import PlainTextResponse
+from app.routers import repo_analyzer, batch_analyzer, webhooks
+from app.utils import github_client, repository_analysis, metrics, shared_cache, global_limiter, warmup
 from fastapi.middleware.cors import CORSMiddleware
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The pooled GitHub and OpenAI clients are built on first use, or in the
+    # background straight away with PREWARM_CONNECTIONS, so startup stays fast
+    warmup.start()
+    # Revalidate hot cache entries in the background
+    await repo_analyzer.REFRESHER.start()
+    yield
+    await warmup.stop()
+    await repo_analyzer.REFRESHER.stop()
+    await github_client.close_client()
+    await repository_analysis.close_openai_client()
+    await global_limiter.close()
+    await shared_cache.SHARED_CACHE.close()
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "http://localhost:3000",  
@@ -27,7 +45,14 @@ app.add_middleware(
 )
 
 app.include_router(repo_analyzer.router)
+app.include_router(batch_analyzer.router)
+app.include_router(webhooks.router)
 
 @app.get("/")
 async def read_root():
     return {"message": "Welcome to the GitHub Repo Analyzer"}
+
+# Prometheus scrape endpoint
+@app.get("/metrics", response_class=PlainTextResponse)
+async def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,6 +1,6 @@
 # app/models/models.py
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 
 class UserProfile(BaseModel):
@@ -21,8 +21,9 @@ class RepoAnalysis(BaseModel):
     forks_to_stars_ratio: float
     issues_resolution_rate: float
     engagement_score: float
-    analysis: str
+    analysis: Optional[str] = None
     overall_score: int
+    degraded: bool = False  # analysis missing or failed; the metrics are still valid
 
 class LanguageUsage(BaseModel):
     language: str
@@ -37,3 +38,9 @@ class LanguageYearUsage(BaseModel):
     language: str
     year: int
     size: int
+
+class BatchAnalysisRequest(BaseModel):
+    usernames: List[str] = Field(..., min_length=1, max_length=500)
+    limit: int = Field(2, ge=1, le=20)  # top repos scored per user
+    include_analysis: bool = False  # run the LLM analysis for each top repo
+    include_commits: bool = False  # add language/year commit usage per user
@@ -0,0 +1,254 @@
+# app/routers/batch_analyzer.py
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from app.utils import github_client, github_queries, json_utils
+from app.utils.analyzer_utils import select_top_repos
+from app.utils.repository_analysis import generate_repo_analyses
+from app.utils.batch_scoring import score_repos, POPULATION_INDEX
+from app.models.models import BatchAnalysisRequest
+from app.routers.repo_analyzer import aggregate_commits_by_language, cached
+import logging
+import asyncio
+import os
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Aliased GraphQL batches in flight at once for one batch request
+BATCH_QUERY_CONCURRENCY = int(os.getenv("BATCH_QUERY_CONCURRENCY", "2"))
+
+BATCH_USER_QUERY_REPOS = 20
+
+# Longest a chunk's query waits for the rest of its users to miss the cache
+BATCH_FETCH_WINDOW = float(os.getenv("BATCH_FETCH_WINDOW", "0.05"))
+
+def _error_result(username, status_code, detail):
+    return {"type": "user", "username": username, "status": "error", "status_code": status_code, "detail": detail}
+
+class _UserBatch:
+    """Joins the per-user computes cached() makes for one chunk into one aliased query.
+
+    The query goes out once every username has either asked for its data or
+    been answered from cache, or BATCH_FETCH_WINDOW seconds after the first
+    ask, so a user waiting on another request's fetch can't hold it up.
+    Later computes (e.g. a background refresh) are queried on their own.
+    """
+
+    def __init__(self, usernames):
+        self.undecided = set(usernames)
+        self.waiting = {}  # username -> future for the next query
+        self.timer = None
+        self.queries = set()  # query tasks still running
+
+    async def fetch(self, username):
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[username] = future
+        if self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(BATCH_FETCH_WINDOW, self._send)
+        self.decided(username)
+        user_data = await future
+        if isinstance(user_data, HTTPException):
+            raise user_data
+        return user_data
+
+    def decided(self, username):
+        self.undecided.discard(username)
+        if not self.undecided:
+            self._send()
+
+    def _send(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.waiting:
+            return
+        waiting, self.waiting = self.waiting, {}
+        task = asyncio.ensure_future(self._query(waiting))
+        self.queries.add(task)
+        task.add_done_callback(self.queries.discard)
+
+    async def _query(self, waiting):
+        try:
+            users = await _query_users(list(waiting))
+        except Exception as exc:
+            users = {username: exc for username in waiting}
+        for username, future in waiting.items():
+            # A caller cancelled meanwhile no longer wants the result
+            if future.done():
+                continue
+            if isinstance(users[username], Exception) and not isinstance(users[username], HTTPException):
+                future.set_exception(users[username])
+            else:
+                future.set_result(users[username])
+
+async def fetch_users_batch(usernames):
+    """Return {username: user_data or HTTPException} using one aliased query for the cache misses."""
+    batch = _UserBatch(usernames)
+
+    # Through cached() like the single-user routes, so the shared cache,
+    # in-flight fetches, stale refresh and invalidations all apply
+    async def fetch(username):
+        try:
+            return await cached(f"repo_metrics:{username.lower()}", lambda: batch.fetch(username))
+        except HTTPException as exc:
+            return exc
+        finally:
+            batch.decided(username)
+
+    results = await asyncio.gather(*(fetch(username) for username in usernames))
+    return dict(zip(usernames, results))
+
+async def _query_users(usernames):
+    query = github_queries.build_batch_user_query(
+        len(usernames),
+        repo_fields=[github_queries.REPO_METRIC_FIELDS],
+        repos_first=BATCH_USER_QUERY_REPOS,
+    )
+    data = await github_client.graphql_query(query, github_queries.batch_variables(usernames))
+
+    # A missing user fails only its own alias; map errors back by path
+    errors = {}
+    for error in data.get('errors') or []:
+        path = error.get('path') or []
+        if path:
+            errors[path[0]] = error
+        else:
+            # Errors without a path (e.g. a syntax error) affect every alias
+            raise HTTPException(status_code=400, detail=f"GitHub API error: {error.get('message', 'Unknown error')}")
+
+    users = data.get("data") or {}
+    results = {}
+    for index, username in enumerate(usernames):
+        alias = f"u{index}"
+        user_data = users.get(alias)
+        if user_data is not None:
+            results[username] = user_data
+        elif alias in errors and errors[alias].get('type') != 'NOT_FOUND':
+            message = errors[alias].get('message', 'Unknown error')
+            results[username] = HTTPException(status_code=400, detail=f"GitHub API error: {message}")
+        else:
+            results[username] = HTTPException(status_code=404, detail="User not found")
+    return results
+
+def _score_users(users, limit):
+    # Score every top repo of every user in the batch in one vectorized pass
+    top_repos = {}
+    for username, user_data in users.items():
+        if isinstance(user_data, Exception):
+            continue
+        top_repos[username] = select_top_repos(user_data['repositories']['nodes'], username, limit)
+
+    all_repos = [repo for repos in top_repos.values() for repo in repos]
+    records = score_repos(all_repos)
+    scores = [record["overall_score"] for record in records]
+    # Only owned repos are selected, so owner/name identifies each one
+    keys = [f"{username.lower()}/{repo.get('name')}" for username, repos in top_repos.items() for repo in repos]
+    POPULATION_INDEX.update(keys, scores)
+    for record, percentile, rank in zip(records, POPULATION_INDEX.percentiles(scores), POPULATION_INDEX.ranks(scores)):
+        record["percentile"] = float(percentile)
+        record["rank"] = int(rank)
+
+    scored = {}
+    start = 0
+    for username, repos in top_repos.items():
+        scored[username] = records[start:start + len(repos)]
+        start += len(repos)
+    return scored
+
+async def _complete_user(username, records, request):
+    if request.include_analysis:
+        analyses = await generate_repo_analyses(records)
+        for record, analysis in zip(records, analyses):
+            record.update(analysis)
+
+    result = {"type": "user", "username": username, "status": "ok", "repos": records}
+    if request.include_commits:
+        usage_list = await aggregate_commits_by_language(username, None)
+        result["languages"] = usage_list
+    return result
+
+async def _batch_events(request, usernames):
+    queue = asyncio.Queue()
+    semaphore = asyncio.Semaphore(BATCH_QUERY_CONCURRENCY)
+
+    # Usernames that don't have their record on the queue yet; the stream
+    # ends only after one record per username
+    pending = set(usernames)
+
+    async def emit(result):
+        pending.discard(result["username"])
+        await queue.put(result)
+
+    async def run_user(username, records):
+        try:
+            await emit(await _complete_user(username, records, request))
+        except HTTPException as exc:
+            await emit(_error_result(username, exc.status_code, exc.detail))
+        except Exception as exc:
+            logger.exception(f"An error occurred in batch analysis for {username}: {str(exc)}")
+            await emit(_error_result(username, 500, str(exc)))
+
+    async def run_chunk(chunk):
+        try:
+            try:
+                async with semaphore:
+                    users = await fetch_users_batch(chunk)
+            except HTTPException as exc:
+                users = {username: exc for username in chunk}
+            except github_client.HTTPStatusError as exc:
+                users = {username: HTTPException(status_code=exc.response.status_code, detail=str(exc)) for username in chunk}
+
+            scored = _score_users(users, request.limit)
+            user_tasks = []
+            for username, user_data in users.items():
+                if isinstance(user_data, HTTPException):
+                    await emit(_error_result(username, user_data.status_code, user_data.detail))
+                elif not scored[username]:
+                    await emit(_error_result(username, 404, "No owned repositories found for this user."))
+                else:
+                    user_tasks.append(run_user(username, scored[username]))
+            await asyncio.gather(*user_tasks)
+        except Exception as exc:
+            logger.exception(f"An error occurred in batch {chunk}: {str(exc)}")
+            for username in chunk:
+                if username in pending:
+                    await emit(_error_result(username, 500, str(exc)))
+
+    batch_size = github_queries.batch_size_for(BATCH_USER_QUERY_REPOS)
+    chunks = [usernames[start:start + batch_size] for start in range(0, len(usernames), batch_size)]
+    tasks = [asyncio.create_task(run_chunk(chunk)) for chunk in chunks]
+
+    succeeded = failed = 0
+    try:
+        for _ in usernames:
+            result = await queue.get()
+            if result["status"] == "ok":
+                succeeded += 1
+            else:
+                failed += 1
+            yield json_utils.dumps(result) + b"\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    yield json_utils.dumps({"type": "summary", "succeeded": succeeded, "failed": failed}) + b"\n"
+
+# Batch analysis route. Streams newline-delimited JSON: one "user" record per
+# username as soon as it completes (status "ok" or "error"), then a "summary".
+# Each repo carries its percentile and rank among the latest scores of all
+# repos scored so far.
+@router.post("/repos/batch")
+async def batch_analyze_repositories(request: BatchAnalysisRequest):
+    # Drop duplicate usernames, keeping the first spelling
+    seen = set()
+    usernames = []
+    for username in request.usernames:
+        if username.lower() not in seen:
+            seen.add(username.lower())
+            usernames.append(username)
+
+    logger.info(f"Batch analysis for {len(usernames)} users")
+    return StreamingResponse(_batch_events(request, usernames), media_type="application/x-ndjson")
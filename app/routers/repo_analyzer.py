@@ -1,15 +1,37 @@
 # app/routers/repo_analyzer.py
 
-from fastapi import APIRouter, HTTPException
-from app.utils import github_client
-from app.utils.analyzer_utils import extract_user_profile
-from app.utils.repository_analysis import chain_of_thought_analysis
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app.utils import github_client, github_queries, commit_history, json_utils, deadlines
+from app.utils.json_utils import FastJSONResponse
+from app.utils.cache import TTLCache, SingleFlight
+from app.utils.commit_store import CommitStore
+from app.utils.commit_columns import CommitColumns, COMMIT_LANGUAGE_WEIGHTING
+from app.utils.log_utils import log_payload
+from app.utils.metrics import register_cache, Gauge
+from app.utils.refresh_worker import RefreshWorker, serve_stale
+from app.utils.shared_cache import SHARED_CACHE
+from app.utils.change_detection import (
+    CHANGE_DETECTOR,
+    PROFILE_PROBE,
+    REPOS_PROBE,
+    EVENTS_PROBE,
+    probes_for,
+)
+from app.utils.analyzer_utils import extract_user_profile, TopRepos
+from app.utils.repository_analysis import (
+    chain_of_thought_analyses,
+    calculate_key_metrics,
+    compute_overall_score,
+    stream_repo_analysis,
+)
 from app.models.models import UserProfile, RepoAnalysis, LanguageYearUsage
-from typing import List
+from typing import List, Literal, Optional
+from datetime import date
 import logging
 import asyncio
-from collections import defaultdict
-import httpx
+import os
+import time
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -17,121 +39,279 @@ logging.basicConfig(level=logging.INFO)
 
 router = APIRouter()
 
-# Create a semaphore to limit concurrent GitHub API calls
-GITHUB_SEMAPHORE = asyncio.Semaphore(5)  # Adjust the limit as needed
-
-# Consolidated fetch function that pulls both user profile and repos
-async def fetch_user_profile_and_repos(username: str):
-    query = """
-    query ($username: String!) {
-      user(login: $username) {
-        login
-        name
-        avatarUrl
-        bio
-        createdAt
-        followers {
-          totalCount
-        }
-        following {
-          totalCount
-        }
-        repositories(
-          first: 20,
-          ownerAffiliations: OWNER,
-          isFork: false,
-          orderBy: { field: STARGAZERS, direction: DESC }
-        ) {
-          nodes {
-            name
-            stargazerCount
-            forkCount
-            openIssues: issues(states: OPEN) {
-              totalCount
-            }
-            closedIssues: issues(states: CLOSED) {
-              totalCount
-            }
-            watchers {
-              totalCount
-            }
-            description
-            primaryLanguage {
-              name
-            }
-            languages(first: 10) {
-              edges {
-                size
-                node {
-                  name
-                }
-              }
-            }
-            owner {
-              login
-            }
-            isFork
-            updatedAt
-            defaultBranchRef {
-              target {
-                ... on Commit {
-                  history(first: 100) {
-                    edges {
-                      node {
-                        committedDate
-                        additions
-                        deletions
-                      }
-                    }
-                  }
-                }
-              }
-            }
-          }
-        }
-      }
-    }
-    """
+# Parsed user payloads and route results shared by the profile, analysis and
+# commits routes. Expired entries are kept for USER_CACHE_STALE_TTL seconds
+# more so they can be served while the refresh worker recomputes them.
+USER_CACHE = TTLCache(
+    maxsize=int(os.getenv("USER_CACHE_MAXSIZE", "256")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "300")),
+    stale_ttl=float(os.getenv("USER_CACHE_STALE_TTL", "3600")),
+)
+USER_FETCHES = SingleFlight()
+register_cache("user", USER_CACHE.stats)
+
+# Background revalidation of USER_CACHE, started from the app lifespan
+REFRESHER = RefreshWorker(USER_CACHE)
+Gauge(
+    "cache_refresh_keys", "Keys tracked by the background refresher, by state.",
+    lambda: {(state,): value for state, value in REFRESHER.stats().items()},
+    labelnames=("state",),
+)
+
+# Persisted per-repo commit aggregates with their last-seen commit
+COMMIT_STORE = CommitStore()
+
+# Look up key in USER_CACHE, then the cache shared with other workers, and
+# only compute it when neither has it. With probes (REST paths), an expired
+# result is first revalidated by ETag and reused if GitHub reports no change.
+async def cached(key: str, compute, probes=()):
+    await _drop_if_invalidated(key)
+
+    async def revalidate():
+        return await CHANGE_DETECTOR.revalidate(key, probes, compute, lambda: USER_CACHE.peek(key))
 
+    try:
+        return await serve_stale(USER_CACHE, USER_FETCHES, REFRESHER, key, revalidate, shared=SHARED_CACHE)
+    except deadlines.DeadlineExceeded:
+        # A joined in-flight computation runs on the budget of the request that
+        # started it; if ours still has time left, start one of our own
+        left = deadlines.remaining()
+        if left is not None and left <= 0:
+            raise
+        return await serve_stale(USER_CACHE, USER_FETCHES, REFRESHER, key, revalidate, shared=SHARED_CACHE)
+
+# How long an invalidation is remembered in the shared cache: as long as any
+# local entry cached before it can still be served
+INVALIDATION_TTL = USER_CACHE.ttl + USER_CACHE.stale_ttl
+
+# Keys are "family:user" or "family:user:<params>"; an invalidation of the
+# family for that user is published under this key with its time
+def _invalidation_key(key: str):
+    family, user = key.split(":")[:2]
+    return f"invalidated:{family}:{user}"
+
+# Other workers learn about invalidate_user() calls through the shared cache:
+# a local entry stored before the last invalidation of its family is dropped
+# instead of served. One shared lookup per local hit; nothing without a
+# shared backend, where there is only this worker's cache to invalidate.
+async def _drop_if_invalidated(key: str):
+    stored_at = USER_CACHE.stored_at(key)
+    if stored_at is None or not SHARED_CACHE.enabled:
+        return
+    invalidated_at, _ = await SHARED_CACHE.get(_invalidation_key(key))
+    if invalidated_at is not None and stored_at <= invalidated_at:
+        USER_CACHE.invalidate(key)
+        CHANGE_DETECTOR.forget(key)
+
+# Drop username's cached results in the given key families ("profile",
+# "analysis", ...) from every layer cached() reads, on every worker sharing
+# SHARED_CACHE, e.g. when a webhook reports a change. Hot entries are
+# recomputed here in the background straight away, so their next request is
+# still served from cache.
+async def invalidate_user(username: str, families):
+    user = username.lower()
+    dropped = []
+    for family in families:
+        exact, prefix = f"{family}:{user}", f"{family}:{user}:"
+        await SHARED_CACHE.set(_invalidation_key(exact), time.time(), INVALIDATION_TTL)
+        if USER_CACHE.invalidate(exact):
+            dropped.append(exact)
+        dropped.extend(USER_CACHE.invalidate_prefix(prefix))
+        CHANGE_DETECTOR.forget(exact)
+        CHANGE_DETECTOR.forget_prefix(prefix)
+        await SHARED_CACHE.delete(exact)
+        await SHARED_CACHE.delete_prefix(prefix)
+
+    refreshing = [key for key in dropped if REFRESHER.running and REFRESHER.is_hot(key) and REFRESHER.schedule(key)]
+    logger.info("Invalidated %d cached results for %s (%d refreshing)", len(dropped), username, len(refreshing))
+    return dropped
+
+# Per-route user queries, each selecting only the fields that route reads
+USER_QUERIES = {
+    "profile": github_queries.PROFILE_QUERY,
+}
+# REST resources whose ETags tell us each query's result may have changed
+USER_QUERY_PROBES = {
+    "profile": (PROFILE_PROBE,),
+}
+
+# Upper bound on ?limit= for the analysis routes, which bounds the LLM work per request
+ANALYZE_MAX_LIMIT = int(os.getenv("ANALYZE_MAX_LIMIT", "10"))
+# Stop paging repositories after this many (0 = all of them)
+ANALYZE_MAX_REPOS = int(os.getenv("ANALYZE_MAX_REPOS", "0"))
+
+# Fetch the user payload for one of USER_QUERIES. Concurrent callers for the
+# same username and query share one in-flight request and the parsed result
+# is cached for USER_CACHE_TTL seconds, then served stale while it refreshes.
+async def fetch_user(username: str, query_name: str):
+    key = f"{query_name}:{username.lower()}"
+    probes = probes_for(username, *USER_QUERY_PROBES[query_name])
+    return await cached(key, lambda: _query_user(username, query_name), probes)
+
+async def _query_user(username: str, query_name: str):
     variables = {"username": username}
 
-    # Limit concurrent GitHub API calls
-    async with GITHUB_SEMAPHORE:
-        data = await github_client.graphql_query(query, variables)
+    # Concurrency and rate limit pacing are handled by the shared scheduler
+    data = await github_client.graphql_query(USER_QUERIES[query_name], variables)
 
     # Log the raw data received from GitHub
-    logger.info(f"GitHub response data for user {username}: {data}")
+    log_payload(logger, f"GitHub {query_name} response data for user {username}", data)
 
-    if 'errors' in data:
-        error_message = data['errors'][0].get('message', 'Unknown error')
-        logger.error(f"GitHub API error: {error_message}")
-        raise HTTPException(status_code=400, detail=f"GitHub API error: {error_message}")
+    github_client.raise_for_graphql_errors(data)
 
     if not data.get("data") or not data["data"].get("user"):
         logger.error(f"No user data found for {username}")
         raise HTTPException(status_code=404, detail="User not found")
 
-    # Log the user data being returned
-    logger.info(f"User data for {username}: {data['data']['user']}")
-
     # Return the entire user data
     return data["data"]["user"]
 
+async def aggregate_commits_by_language(username: str, since: Optional[date], weighting: str = COMMIT_LANGUAGE_WEIGHTING):
+    if since is None:
+        # Full history comes from the persisted per-repo totals, topped up
+        # with only the commits pushed since the last refresh
+        usage = await commit_history.sync_commit_history(username, COMMIT_STORE, weighting=weighting)
+    else:
+        # A date horizon can't be answered from yearly totals, so stream
+        # the matching commit pages into columns and aggregate them at once
+        columns = CommitColumns()
+        await commit_history.ingest_commit_history(username, columns, since=since)
+        usage = columns.usage(weighting)
+
+    # Build LanguageYearUsage-shaped dicts directly; the fields are already
+    # the right types, so there is nothing for pydantic to validate
+    usage_list = []
+    for language, years in usage.items():
+        for year, size in years.items():
+            usage_list.append({
+                "language": language,
+                "year": int(year),
+                "size": int(size)
+            })
+    return usage_list
+
+async def _select_top_repos(username: str, limit: int, rank_by: str):
+    # Page through the owned repositories, keeping only the best `limit`
+    top = TopRepos(username, limit, rank_by)
+    async for repos in commit_history.iter_repositories(
+        username, max_repos=ANALYZE_MAX_REPOS, query=github_queries.REPO_METRICS_QUERY
+    ):
+        log_payload(logger, f"Repositories page for {username}", repos)
+        top.add(repos)
+        # Pages come most starred first and limit <= ANALYZE_MAX_LIMIT is
+        # within one page, so only score ranking needs every repository
+        if rank_by == "stars" and top.seen >= limit:
+            break
+
+    top_repos = top.result()
+    logger.info("Selected %d of %d repositories for %s by %s", len(top_repos), top.seen, username, rank_by)
+    return top_repos
+
+async def _top_owned_repos(username: str, limit: int, rank_by: str = "stars"):
+    key = f"top_repos:{username.lower()}:{rank_by}:{limit}"
+    top_repos = await cached(
+        key, lambda: _select_top_repos(username, limit, rank_by), probes_for(username, REPOS_PROBE)
+    )
+
+    if not top_repos:
+        logger.error(f"No owned repositories found for {username}")
+        raise HTTPException(
+            status_code=404, detail="No owned repositories found for this user."
+        )
+
+    return top_repos
+
+async def _analyze_top_repos(username: str, limit: int, rank_by: str):
+    # Rank every repository locally; only the final `limit` reach the LLM
+    top_repos = await _top_owned_repos(username, limit, rank_by)
+
+    # Analyze the top repositories, several per completion
+    analysis_results_raw = await chain_of_thought_analyses(top_repos)
+
+    # Log the analysis results
+    for repo, analysis_result in zip(top_repos, analysis_results_raw):
+        log_payload(logger, f"Analysis result for repo {repo['name']}", analysis_result)
+
+    if any(result.get("degraded") for result in analysis_results_raw):
+        # Return the metrics, but leave the cache for a complete result
+        raise deadlines.Degraded(analysis_results_raw)
+    return analysis_results_raw
+
+async def _analysis_events(repos, expires_at=None):
+    # Scores are local arithmetic, so send them before any LLM work starts
+    all_metrics = [calculate_key_metrics(repo) for repo in repos]
+    for metrics in all_metrics:
+        record = {**metrics, "overall_score": compute_overall_score(metrics)}
+        yield json_utils.dumps({"type": "metrics", **record}) + b"\n"
+
+    # Interleave the completion chunks of every repo as they are generated
+    queue = asyncio.Queue()
+
+    async def pump(metrics):
+        chunks = []
+        degraded = False
+        error = None
+        try:
+            with deadlines.until(expires_at):
+                async for delta in stream_repo_analysis(metrics):
+                    chunks.append(delta)
+                    await queue.put({"type": "analysis_delta", "repo_name": metrics["repo_name"], "delta": delta})
+        except deadlines.DeadlineExceeded:
+            degraded = True
+        except Exception as e:
+            # Reported beside the analysis, never as part of its text
+            logger.exception(f"API call error: {str(e)}")
+            degraded = True
+            error = f"Error calling OpenAI API: {str(e)}"
+        finally:
+            event = {"type": "analysis", "repo_name": metrics["repo_name"], "analysis": "".join(chunks).strip()}
+            if degraded:
+                event["degraded"] = True
+            if error is not None:
+                event["error"] = error
+            await queue.put(event)
+
+    tasks = [asyncio.create_task(pump(metrics)) for metrics in all_metrics]
+    # Deltas received so far for each repo still generating
+    pending = {metrics["repo_name"]: [] for metrics in all_metrics}
+    try:
+        while pending:
+            try:
+                with deadlines.until(expires_at):
+                    event = await deadlines.run(queue.get(), "stream")
+            except deadlines.DeadlineExceeded:
+                break
+            if event["type"] == "analysis":
+                pending.pop(event["repo_name"], None)
+            else:
+                pending[event["repo_name"]].append(event["delta"])
+            yield json_utils.dumps(event) + b"\n"
+
+        # Out of time: close every unfinished repo with the text it has so far
+        for repo_name, chunks in pending.items():
+            event = {"type": "analysis", "repo_name": repo_name, "analysis": "".join(chunks).strip(), "degraded": True}
+            yield json_utils.dumps(event) + b"\n"
+    finally:
+        # The client may disconnect mid-stream; stop generating for it
+        for task in tasks:
+            task.cancel()
+
 # User profile route
 @router.get("/user/{username}", response_model=UserProfile)
 async def get_user_profile(username: str):
     try:
-        user_data = await fetch_user_profile_and_repos(username)
+        with deadlines.deadline():
+            user_data = await deadlines.run(fetch_user(username, "profile"), "profile")
         logger.info(f"Fetched user data for {username}")
 
         user_profile = extract_user_profile(user_data)
-        logger.info(f"Extracted user profile for {username}: {user_profile}")
+        log_payload(logger, f"Extracted user profile for {username}", user_profile)
 
-        return user_profile
+        return FastJSONResponse(user_profile)
     except HTTPException as exc:
         logger.error(f"HTTPException in get_user_profile: {exc.detail}")
         raise exc  # Re-raise HTTP exceptions to be handled by FastAPI
-    except httpx.HTTPStatusError as exc:
+    except github_client.HTTPStatusError as exc:
         logger.error(f"HTTPStatusError in get_user_profile: {exc}")
         raise HTTPException(status_code=exc.response.status_code, detail=str(exc))
     except Exception as exc:
@@ -140,125 +320,97 @@ async def get_user_profile(username: str):
 
 # Repo analyzer route
 @router.get("/repos/analyze/{username}", response_model=List[RepoAnalysis])
-async def analyze_repositories(username: str):
+async def analyze_repositories(
+    username: str,
+    limit: int = Query(2, ge=1, le=ANALYZE_MAX_LIMIT),
+    rank_by: Literal["stars", "score"] = "stars",
+):
     try:
-        # Fetch user data, including repositories
-        user_data = await fetch_user_profile_and_repos(username)
-        logger.info(f"Fetched user data for {username}")
-
-        # Access the repositories
-        data = user_data['repositories']['nodes']
-        logger.info(f"Repositories for {username}: {data}")
-
-        # Filter repositories to ensure they are owned by the user and not forks
-        user_repos = [
-            repo for repo in data if repo['owner']['login'].lower() == username.lower() and not repo['isFork']
-        ]
-        logger.info(f"User-owned repositories for {username}: {user_repos}")
-
-        if not user_repos:
-            logger.error(f"No owned repositories found for {username}")
-            raise HTTPException(
-                status_code=404, detail="No owned repositories found for this user."
-            )
-
-        # Sort the user_repos by stargazerCount in descending order
-        sorted_repos = sorted(user_repos, key=lambda r: r.get("stargazerCount", 0), reverse=True)
-        logger.info(f"Sorted repositories by stars for {username}: {sorted_repos}")
-
-        # Take the top two repositories
-        top_two_repos = sorted_repos[:2]
-        logger.info(f"Top two repositories for {username}: {top_two_repos}")
-
-        # Perform analysis on each of the top two repositories
-        analysis_tasks = [chain_of_thought_analysis(repo) for repo in top_two_repos]
-        analysis_results_raw = await asyncio.gather(*analysis_tasks)
+        # Popular users get the last result immediately while it revalidates
+        key = f"analysis:{username.lower()}:{rank_by}:{limit}"
+        with deadlines.deadline():
+            try:
+                analysis_results_raw = await deadlines.run(
+                    cached(key, lambda: _analyze_top_repos(username, limit, rank_by), probes_for(username, REPOS_PROBE)),
+                    "analysis",
+                )
+            except deadlines.Degraded as exc:
+                # Metrics and scores, with `degraded` set where the analysis is missing
+                analysis_results_raw = exc.value
         analysis_results = [RepoAnalysis(**result) for result in analysis_results_raw]
 
-        # Log the analysis results
-        for repo, analysis_result in zip(top_two_repos, analysis_results_raw):
-            logger.info(f"Analysis result for repo {repo['name']}: {analysis_result}")
-
         # Return the list of analysis results
-        return analysis_results
+        return FastJSONResponse(analysis_results)
 
     except HTTPException as exc:
         logger.error(f"HTTPException in analyze_repositories: {exc.detail}")
         raise exc  # Re-raise HTTP exceptions to be handled by FastAPI
-    except httpx.HTTPStatusError as exc:
+    except github_client.HTTPStatusError as exc:
         logger.error(f"HTTPStatusError in analyze_repositories: {exc}")
         raise HTTPException(status_code=exc.response.status_code, detail=str(exc))
     except Exception as exc:
         logger.exception(f"An error occurred in analyze_repositories: {str(exc)}")
         raise HTTPException(status_code=500, detail=str(exc))
 
-# New route to get language usage by year grouped by commit size
-@router.get("/repos/commits/{username}", response_model=List[LanguageYearUsage])
-async def get_commits_by_language(username: str):
+# Streaming variant of the repo analyzer route. Emits newline-delimited JSON:
+# one "metrics" record per repo straight away, then "analysis_delta" records
+# as the completion streams in, and a final "analysis" record per repo, marked
+# "degraded" when the request deadline or a failed completion cut its analysis
+# short, with the failure in "error".
+@router.get("/repos/analyze/{username}/stream")
+async def stream_repository_analysis(
+    username: str,
+    limit: int = Query(2, ge=1, le=ANALYZE_MAX_LIMIT),
+    rank_by: Literal["stars", "score"] = "stars",
+):
     try:
-        # Fetch user data, including repositories
-        user_data = await fetch_user_profile_and_repos(username)
-        logger.info(f"Fetched user data for {username}")
-
-        repos = user_data['repositories']['nodes']
-        logger.info(f"Repositories for {username}: {repos}")
+        # Resolve the repos up front so lookup errors still return a proper status
+        with deadlines.deadline():
+            top_repos = await deadlines.run(_top_owned_repos(username, limit, rank_by), "github")
+            # The analysis streamed afterwards shares what is left of the budget
+            expires_at = deadlines.current()
+        return StreamingResponse(_analysis_events(top_repos, expires_at), media_type="application/x-ndjson")
 
-        # Initialize data structure
-        language_usage = defaultdict(lambda: defaultdict(int))
-
-        for repo in repos:
-            repo_languages = [edge['node']['name'] for edge in repo.get('languages', {}).get('edges', [])]
-
-            # Check if defaultBranchRef and its nested keys exist
-            default_branch_ref = repo.get('defaultBranchRef')
-            if not default_branch_ref:
-                logger.warning(f"No default branch ref found for repo: {repo.get('name')}")
-                continue
-
-            target = default_branch_ref.get('target')
-            if not target:
-                logger.warning(f"No target found for default branch ref in repo: {repo.get('name')}")
-                continue
-
-            history = target.get('history')
-            if not history:
-                logger.warning(f"No commit history found for repo: {repo.get('name')}")
-                continue
-
-            commits = history.get('edges', [])
-
-            for commit in commits:
-                commit_node = commit['node']
-                commit_date = commit_node['committedDate']
-                year = commit_date[:4]
-                additions = commit_node.get('additions', 0)
-                deletions = commit_node.get('deletions', 0)
-                total_changes = additions + deletions
-
-                if total_changes == 0:
-                    continue
-
-                for language in repo_languages:
-                    language_usage[language][year] += total_changes / len(repo_languages)
+    except HTTPException as exc:
+        logger.error(f"HTTPException in stream_repository_analysis: {exc.detail}")
+        raise exc
+    except github_client.HTTPStatusError as exc:
+        logger.error(f"HTTPStatusError in stream_repository_analysis: {exc}")
+        raise HTTPException(status_code=exc.response.status_code, detail=str(exc))
+    except Exception as exc:
+        logger.exception(f"An error occurred in stream_repository_analysis: {str(exc)}")
+        raise HTTPException(status_code=500, detail=str(exc))
 
-        # Convert to list of LanguageYearUsage
-        usage_list = []
-        for language, years in language_usage.items():
-            for year, size in years.items():
-                usage_list.append(LanguageYearUsage(
-                    language=language,
-                    year=int(year),
-                    size=int(size)
-                ))
+# New route to get language usage by year grouped by commit size
+@router.get("/repos/commits/{username}", response_model=List[LanguageYearUsage])
+async def get_commits_by_language(
+    username: str,
+    since: Optional[date] = None,
+    weighting: Literal["even", "size"] = COMMIT_LANGUAGE_WEIGHTING,
+):
+    try:
+        # Only count commits after `since` (defaults to COMMIT_HISTORY_HORIZON_DAYS).
+        # weighting=size splits each repo's changes by its language byte sizes.
+        since = since or commit_history.default_since()
+        key = f"commits:{username.lower()}:{since.isoformat() if since else 'all'}:{weighting}"
+        with deadlines.deadline():
+            usage_list = await deadlines.run(
+                cached(
+                    key,
+                    lambda: aggregate_commits_by_language(username, since, weighting),
+                    probes_for(username, REPOS_PROBE, EVENTS_PROBE),
+                ),
+                "commits",
+            )
 
-        logger.info(f"Language usage for {username}: {usage_list}")
+        logger.info("Language usage for %s: %d language-years", username, len(usage_list))
 
-        return usage_list
+        return FastJSONResponse(usage_list)
 
     except HTTPException as exc:
         logger.error(f"HTTPException in get_commits_by_language: {exc.detail}")
         raise exc
-    except httpx.HTTPStatusError as exc:
+    except github_client.HTTPStatusError as exc:
         logger.error(f"HTTPStatusError in get_commits_by_language: {exc}")
         raise HTTPException(status_code=exc.response.status_code, detail=str(exc))
     except Exception as exc:
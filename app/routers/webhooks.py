@@ -0,0 +1,117 @@
+# app/routers/webhooks.py
+#
+# GitHub webhook receiver. Deliveries for push, star, fork, issues and
+# repository events are checked against GITHUB_WEBHOOK_SECRET and mapped to
+# the users whose cached results they change; only those entries are
+# dropped, on every worker sharing SHARED_CACHE_URL (without one, only the
+# worker that received the delivery). With webhooks configured on the repos
+# we serve, USER_CACHE_TTL can then be raised well beyond the default
+# without serving stale results.
+
+from fastapi import APIRouter, HTTPException, Request
+from app.utils import json_utils
+from app.utils.json_utils import FastJSONResponse
+from app.utils.metrics import Counter
+from app.routers.repo_analyzer import invalidate_user
+import hashlib
+import hmac
+import logging
+import os
+from urllib.parse import parse_qs
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Shared secret set on the GitHub webhook; deliveries are refused without one
+GITHUB_WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET", "")
+
+# Cached result families each event can change, for the repository owner
+REPO_METRIC_FAMILIES = ("top_repos", "analysis", "repo_metrics")
+EVENT_FAMILIES = {
+    "push": ("commits",),
+    "star": REPO_METRIC_FAMILIES,
+    "watch": REPO_METRIC_FAMILIES,
+    "fork": REPO_METRIC_FAMILIES,
+    "issues": REPO_METRIC_FAMILIES,
+    "repository": REPO_METRIC_FAMILIES + ("commits",),
+}
+# Issue actions that move the open/closed counts; edits and labels don't
+ISSUE_ACTIONS = {"opened", "closed", "reopened", "deleted", "transferred"}
+
+WEBHOOK_DELIVERIES = Counter(
+    "github_webhook_deliveries_total", "GitHub webhook deliveries by event and result.",
+    labelnames=("event", "result"),
+)
+
+def verify_signature(secret, body, signature):
+    """Check an X-Hub-Signature-256 header against the raw request body."""
+    if not secret or not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature[len("sha256="):])
+
+def affected_users(event, payload):
+    """Return {username: families} for the cached results a delivery changes."""
+    families = EVENT_FAMILIES.get(event)
+    repository = payload.get("repository") or {}
+    owner = (repository.get("owner") or {}).get("login")
+    if families is None or owner is None:
+        return {}
+
+    if event == "push":
+        # Commit aggregates only follow the default branch
+        if payload.get("ref") != f"refs/heads/{repository.get('default_branch')}":
+            return {}
+    elif event == "issues" and payload.get("action") not in ISSUE_ACTIONS:
+        return {}
+
+    # Only the forked repo's owner: every query leaves out forks (isFork:
+    # false), so nothing cached for the user who made the fork changes
+    return {owner: families}
+
+def _parse_payload(body, content_type):
+    # Webhooks can be configured to send JSON or a form with a payload field
+    if content_type.startswith("application/x-www-form-urlencoded"):
+        body = (parse_qs(body.decode("utf-8")).get("payload") or [""])[0]
+    return json_utils.loads(body)
+
+@router.post("/webhooks/github")
+async def receive_github_webhook(request: Request):
+    event = request.headers.get("x-github-event", "")
+    # The header is caller-controlled; keep the metric's label set bounded
+    label = event if event in EVENT_FAMILIES or event == "ping" else "other"
+    body = await request.body()
+
+    if not verify_signature(GITHUB_WEBHOOK_SECRET, body, request.headers.get("x-hub-signature-256")):
+        logger.warning(f"Rejected {event or 'unknown'} webhook delivery with a bad signature")
+        WEBHOOK_DELIVERIES.inc(event=label, result="rejected")
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+
+    try:
+        payload = _parse_payload(body, request.headers.get("content-type", ""))
+    except ValueError:
+        WEBHOOK_DELIVERIES.inc(event=label, result="invalid")
+        raise HTTPException(status_code=400, detail="Webhook payload is not valid JSON")
+    if not isinstance(payload, dict):
+        WEBHOOK_DELIVERIES.inc(event=label, result="invalid")
+        raise HTTPException(status_code=400, detail="Webhook payload must be a JSON object")
+
+    if event == "ping":
+        WEBHOOK_DELIVERIES.inc(event=label, result="ok")
+        return FastJSONResponse({"event": event, "status": "ok"})
+
+    users = affected_users(event, payload)
+    invalidated = {}
+    for username, families in users.items():
+        invalidated[username] = len(await invalidate_user(username, families))
+
+    WEBHOOK_DELIVERIES.inc(event=label, result="ok" if users else "ignored")
+    logger.info(f"Webhook {event} ({payload.get('action', '-')}): invalidated {invalidated or 'nothing'}")
+    return FastJSONResponse({
+        "event": event,
+        "action": payload.get("action"),
+        "status": "ok" if users else "ignored",
+        "invalidated": invalidated,
+    })
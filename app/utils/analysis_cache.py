@@ -0,0 +1,182 @@
+# app/utils/analysis_cache.py
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+ANALYSIS_CACHE_PATH = os.getenv("ANALYSIS_CACHE_PATH", "analysis_cache.sqlite3")
+ANALYSIS_CACHE_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", str(7 * 24 * 3600)))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "10000"))
+# Relative drift allowed per metric before a cached analysis is considered
+# stale, e.g. 0.05 lets 100 stars reuse the text written for 96-105 stars.
+# 0 disables fuzzy reuse and only exact prompts hit.
+ANALYSIS_CACHE_TOLERANCE = float(os.getenv("ANALYSIS_CACHE_TOLERANCE", "0"))
+
+# Metrics compared when ANALYSIS_CACHE_TOLERANCE is enabled
+TOLERANCE_METRICS = ("stars", "forks", "open_issues", "closed_issues", "watchers")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    key TEXT PRIMARY KEY,
+    repo_name TEXT NOT NULL,
+    family TEXT NOT NULL,
+    metrics TEXT NOT NULL,
+    analysis TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS analyses_family ON analyses (family, repo_name);
+CREATE INDEX IF NOT EXISTS analyses_last_access ON analyses (last_access);
+"""
+
+
+def _sha256(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _within_tolerance(cached, current, tolerance):
+    for name in TOLERANCE_METRICS:
+        old, new = cached.get(name, 0) or 0, current.get(name, 0) or 0
+        if abs(new - old) > tolerance * max(abs(old), abs(new)):
+            return False
+    return True
+
+
+class AnalysisCache:
+    """Disk-backed cache of LLM analyses keyed by a hash of model, system prompt and prompt.
+
+    Methods are blocking; call them through asyncio.to_thread from async code.
+    """
+
+    def __init__(self, path=ANALYSIS_CACHE_PATH, ttl=ANALYSIS_CACHE_TTL,
+                 max_entries=ANALYSIS_CACHE_MAX_ENTRIES, tolerance=ANALYSIS_CACHE_TOLERANCE):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.tolerance = tolerance
+        self.hits = 0
+        self.tolerance_hits = 0
+        self.misses = 0
+        # Row count as of this process's last write, so stats() never touches
+        # the file from the event loop
+        self.size = 0
+        # The file is opened and its schema created on first use, not at import
+        self._ready = False
+        self._ready_lock = threading.Lock()
+
+    def _prepare(self, conn):
+        with self._ready_lock:
+            if not self._ready:
+                conn.executescript(SCHEMA)
+                self.size = conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+                self._ready = True
+
+    @contextmanager
+    def _connect(self):
+        # Autocommit mode; multi-statement writes open their own transaction
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            if not self._ready:
+                self._prepare(conn)
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(model, system_prompt, prompt):
+        return _sha256(model, system_prompt, prompt)
+
+    @staticmethod
+    def make_family(model, system_prompt):
+        # Entries in the same family are interchangeable apart from metric drift
+        return _sha256(model, system_prompt)
+
+    def get(self, model, system_prompt, prompt, metrics):
+        now = time.time()
+        key = self.make_key(model, system_prompt, prompt)
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT analysis FROM analyses WHERE key = ? AND created_at > ?",
+                (key, now - self.ttl),
+            ).fetchone()
+
+            if row is None and self.tolerance > 0:
+                candidates = conn.execute(
+                    """
+                    SELECT key, metrics, analysis FROM analyses
+                    WHERE family = ? AND repo_name = ? AND created_at > ?
+                    ORDER BY created_at DESC
+                    """,
+                    (self.make_family(model, system_prompt), metrics.get("repo_name", "Unknown"), now - self.ttl),
+                ).fetchall()
+                for candidate_key, cached_metrics, analysis in candidates:
+                    if _within_tolerance(json.loads(cached_metrics), metrics, self.tolerance):
+                        key, row = candidate_key, (analysis,)
+                        self.tolerance_hits += 1
+                        break
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            conn.execute("UPDATE analyses SET last_access = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return row[0]
+
+    def set(self, model, system_prompt, prompt, metrics, analysis):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO analyses (key, repo_name, family, metrics, analysis, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    self.make_key(model, system_prompt, prompt),
+                    metrics.get("repo_name", "Unknown"),
+                    self.make_family(model, system_prompt),
+                    json.dumps(metrics, sort_keys=True),
+                    analysis,
+                    now,
+                    now,
+                ),
+            )
+            # Drop expired entries, then the least recently used beyond the size bound
+            conn.execute("DELETE FROM analyses WHERE created_at <= ?", (now - self.ttl,))
+            conn.execute(
+                """
+                DELETE FROM analyses WHERE key IN (
+                    SELECT key FROM analyses ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            # Counted here so rows written by other workers are included too
+            size = conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+            conn.execute("COMMIT")
+        self.size = size
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": self.size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "tolerance_hits": self.tolerance_hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
@@ -1,3 +1,8 @@
+# app/utils/analyzer_utils.py
+
+import heapq
+from app.utils.batch_scoring import calculate_key_metrics_batch, compute_overall_scores
+
 def extract_user_profile(user):
     profile = {
         'login': user['login'],
@@ -9,3 +14,52 @@ def extract_user_profile(user):
         'following': user['following']['totalCount'],
     }
     return profile
+
+# Ranking keys for TopRepos: GitHub stars, or the locally computed overall score
+RANK_KEYS = ("stars", "score")
+
+def _rank_values(repos, rank_by):
+    if rank_by == "score":
+        return [int(score) for score in compute_overall_scores(calculate_key_metrics_batch(repos))]
+    return [repo.get("stargazerCount", 0) or 0 for repo in repos]
+
+class TopRepos:
+    """Streaming top-K of a user's own non-fork repositories.
+
+    Feed it pages with add(); only the best `limit` repos are kept in a
+    min-heap, so memory stays O(limit) however many pages the user has.
+    Ties keep the order repos were seen in, like a stable sort.
+    """
+
+    def __init__(self, username, limit, rank_by="stars"):
+        if rank_by not in RANK_KEYS:
+            raise ValueError(f"Unknown ranking key: {rank_by}")
+        self.username = username.lower()
+        self.limit = limit
+        self.rank_by = rank_by
+        self.seen = 0
+        self._heap = []  # (rank value, -arrival, repo)
+
+    def add(self, repos):
+        owned = [
+            repo for repo in repos if repo['owner']['login'].lower() == self.username and not repo['isFork']
+        ]
+        if not owned:
+            return
+        for value, repo in zip(_rank_values(owned, self.rank_by), owned):
+            entry = (value, -self.seen, repo)
+            self.seen += 1
+            if len(self._heap) < self.limit:
+                heapq.heappush(self._heap, entry)
+            elif entry[:2] > self._heap[0][:2]:
+                heapq.heapreplace(self._heap, entry)
+
+    def result(self):
+        """The kept repos, best first."""
+        return [repo for _, _, repo in sorted(self._heap, key=lambda entry: entry[:2], reverse=True)]
+
+def select_top_repos(repos, username, limit, rank_by="stars"):
+    # Keep repositories owned by the user that are not forks, most starred first
+    top = TopRepos(username, limit, rank_by)
+    top.add(repos)
+    return top.result()
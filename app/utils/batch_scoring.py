@@ -0,0 +1,153 @@
+# app/utils/batch_scoring.py
+#
+# Vectorized counterparts of calculate_key_metrics and compute_overall_score
+# for scoring many repositories at once. Results match the scalar functions
+# in repository_analysis.py repo for repo. NumPy is imported on first use.
+
+import itertools
+import logging
+from app.utils.metrics import SCORING_TIME
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+COUNT_FIELDS = ("stars", "forks", "open_issues", "closed_issues", "watchers")
+# compute_overall_score clips to 0..100
+MAX_SCORE = 100
+
+
+def _extract_counts(repo_data):
+    # Same lookups (and the same all-zero fallback) as calculate_key_metrics
+    try:
+        return (
+            repo_data.get('stargazerCount', 0) or 0,
+            repo_data.get('forkCount', 0) or 0,
+            repo_data.get('openIssues', {}).get('totalCount', 0) or 0,
+            repo_data.get('closedIssues', {}).get('totalCount', 0) or 0,
+            repo_data.get('watchers', {}).get('totalCount', 0) or 0,
+        )
+    except Exception as e:
+        logger.warning(f"Error reading metrics for {repo_data.get('name', 'Unknown')}: {str(e)}")
+        return (0, 0, 0, 0, 0)
+
+
+def calculate_key_metrics_batch(repos):
+    """Return a dict of NumPy arrays with the key metrics for every repo."""
+    import numpy as np
+    counts = np.array([_extract_counts(repo) for repo in repos], dtype=np.float64).reshape(-1, len(COUNT_FIELDS))
+    stars, forks, open_issues, closed_issues, watchers = counts.T
+    total_issues = open_issues + closed_issues
+
+    # Divide only where the denominator is non-zero, like the scalar guards
+    forks_to_stars_ratio = np.divide(forks, stars, out=np.zeros_like(forks), where=stars != 0)
+    issues_resolution_rate = np.divide(
+        closed_issues, total_issues, out=np.zeros_like(closed_issues), where=total_issues != 0
+    )
+
+    return {
+        "repo_name": [repo.get('name', 'Unknown') for repo in repos],
+        "stars": stars,
+        "forks": forks,
+        "open_issues": open_issues,
+        "closed_issues": closed_issues,
+        "watchers": watchers,
+        "forks_to_stars_ratio": forks_to_stars_ratio,
+        "issues_resolution_rate": issues_resolution_rate,
+        "engagement_score": (stars + forks * 2 + watchers) / 100,
+    }
+
+
+def compute_overall_scores(metrics):
+    """Vectorized compute_overall_score over the arrays from calculate_key_metrics_batch."""
+    import numpy as np
+    stars_score = np.minimum(35, np.log(metrics["stars"] + 1) * 8)
+    forks_score = np.minimum(15, np.log(metrics["forks"] + 1) * 4)
+    engagement_component = np.minimum(20, np.log(metrics["engagement_score"] + 1) * 5)
+    issues_score = metrics["issues_resolution_rate"] * 20
+    open_issues_penalty = np.minimum(15, metrics["open_issues"] / 5)
+    base_score = 10
+
+    overall_score = (
+        base_score +
+        stars_score +
+        forks_score +
+        engagement_component +
+        issues_score -
+        open_issues_penalty
+    )
+
+    # int() in the scalar path truncates toward zero; scores are already >= 0
+    return np.clip(overall_score, 0, 100).astype(np.int64)
+
+
+def score_repos(repos):
+    """Score many repos at once; returns the same dicts chain_of_thought_analysis builds, minus analysis."""
+    if not repos:
+        return []
+
+    with SCORING_TIME.time(path="batch"):
+        metrics = calculate_key_metrics_batch(repos)
+        scores = compute_overall_scores(metrics)
+
+    records = []
+    for index, repo_name in enumerate(metrics["repo_name"]):
+        record = {"repo_name": repo_name}
+        for field in COUNT_FIELDS:
+            record[field] = int(metrics[field][index])
+        record["forks_to_stars_ratio"] = float(metrics["forks_to_stars_ratio"][index])
+        record["issues_resolution_rate"] = float(metrics["issues_resolution_rate"][index])
+        record["engagement_score"] = float(metrics["engagement_score"][index])
+        record["overall_score"] = int(scores[index])
+        records.append(record)
+    return records
+
+
+class ScorePercentileIndex:
+    """Latest overall score per repo, for percentile and rank lookups.
+
+    Overall scores are integers from 0 to 100, so the population is kept as
+    a count per score; a repo scored again replaces its earlier score.
+    """
+
+    def __init__(self):
+        self._latest = {}  # "owner/name" -> score
+        self._counts = [0] * (MAX_SCORE + 1)
+        self._cumulative = None  # _cumulative[s]: repos scoring at or below s
+
+    def update(self, keys, scores):
+        for key, score in zip(keys, scores):
+            score = min(max(int(score), 0), MAX_SCORE)
+            previous = self._latest.get(key)
+            if previous == score:
+                continue
+            if previous is not None:
+                self._counts[previous] -= 1
+            self._counts[score] += 1
+            self._latest[key] = score
+            self._cumulative = None
+
+    def _at_or_below(self):
+        if self._cumulative is None:
+            self._cumulative = list(itertools.accumulate(self._counts))
+        return self._cumulative
+
+    def __len__(self):
+        return len(self._latest)
+
+    def percentiles(self, scores):
+        """Percentage of the population scoring at or below each score."""
+        total = len(self._latest)
+        if not total:
+            return [0.0] * len(scores)
+        at_or_below = self._at_or_below()
+        return [at_or_below[min(max(int(score), 0), MAX_SCORE)] / total * 100 for score in scores]
+
+    def ranks(self, scores):
+        """1-based rank of each score in the population (1 is the best)."""
+        total = len(self._latest)
+        at_or_below = self._at_or_below()
+        return [total - at_or_below[min(max(int(score), 0), MAX_SCORE)] + 1 for score in scores]
+
+
+# Latest score of every repo scored through the batch path in this process
+POPULATION_INDEX = ScorePercentileIndex()
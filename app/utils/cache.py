@@ -0,0 +1,154 @@
+# app/utils/cache.py
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded in-process LRU cache with per-entry expiry and hit/miss counters.
+
+    With stale_ttl > 0, expired entries are kept that much longer so
+    get_stale() can serve them while a refresh runs.
+    """
+
+    def __init__(self, maxsize=256, ttl=300.0, stale_ttl=0.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value, stored_at)
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, key):
+        # Returns (value, fresh); drops entries past their stale window
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            return _MISSING, False
+
+        expires_at, value, _ = entry
+        now = time.monotonic()
+        if expires_at + self.stale_ttl <= now:
+            del self._entries[key]
+            return _MISSING, False
+
+        self._entries.move_to_end(key)
+        return value, expires_at > now
+
+    def get(self, key, default=None):
+        value, fresh = self._lookup(key)
+        if value is _MISSING or not fresh:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        return value
+
+    def get_stale(self, key, default=None):
+        """Return (value, fresh), including expired entries still inside stale_ttl."""
+        value, fresh = self._lookup(key)
+        if value is _MISSING:
+            self.misses += 1
+            return default, False
+
+        if fresh:
+            self.hits += 1
+        else:
+            self.stale_hits += 1
+        return value, fresh
+
+    def peek(self, key, default=None):
+        """Return the value for key, fresh or stale, without touching stats or LRU order."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] + self.stale_ttl <= time.monotonic():
+            return default
+        return entry[1]
+
+    def expires_in(self, key):
+        """Seconds until key expires (negative once stale), or None if absent."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return entry[0] - time.monotonic()
+
+    def stored_at(self, key):
+        """Wall-clock time key was last set, or None if absent."""
+        entry = self._entries.get(key)
+        return None if entry is None else entry[2]
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        # Wall-clock, so it can be compared with times from other processes
+        self._entries[key] = (expires_at, value, time.time())
+        self._entries.move_to_end(key)
+
+        # Evict least recently used entries once over capacity
+        while len(self._entries) > self.maxsize:
+            evicted_key, _ = self._entries.popitem(last=False)
+            self.evictions += 1
+            logger.debug(f"Evicted cache entry {evicted_key}")
+
+    def invalidate(self, key):
+        return self._entries.pop(key, None) is not None
+
+    def invalidate_prefix(self, prefix):
+        """Drop every key starting with prefix; returns the keys dropped."""
+        keys = [key for key in self._entries if key.startswith(prefix)]
+        for key in keys:
+            del self._entries[key]
+        return keys
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def _retrieve_exception(task):
+    # Every caller may have been cancelled (e.g. by a request deadline) before
+    # the shared task failed; mark its exception seen so asyncio doesn't log it
+    if not task.cancelled():
+        task.exception()
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one in-flight task."""
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def do(self, key, func):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            task.add_done_callback(_retrieve_exception)
+        else:
+            logger.debug(f"Joining in-flight request for {key}")
+
+        # Shield so one cancelled caller does not cancel the shared work
+        return await asyncio.shield(task)
+
+    def __len__(self):
+        return len(self._inflight)
@@ -0,0 +1,146 @@
+# app/utils/change_detection.py
+#
+# Cheap "has anything changed?" checks in front of the expensive GraphQL
+# queries. Each cached result remembers the ETags of a few REST resources
+# (the user, their repo list, their public events) as they were when it was
+# computed. Revalidating sends If-None-Match for each one: if every probe
+# comes back 304 the old result is reused, costing no GraphQL points and
+# nothing against the REST rate limit either.
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from app.utils import github_client
+from app.utils.cache import SingleFlight
+from app.utils.metrics import Counter
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+GITHUB_CONDITIONAL_PROBES = os.getenv("GITHUB_CONDITIONAL_PROBES", "true").lower() in ("1", "true", "yes")
+# Cached results whose validators are remembered; older ones are just recomputed
+CHANGE_DETECTION_MAX_KEYS = int(os.getenv("CHANGE_DETECTION_MAX_KEYS", "4096"))
+# Recompute results older than this even if no probe changed, bounding how
+# long a change the probes can't see (e.g. repo 101+) goes unnoticed
+CHANGE_DETECTION_MAX_AGE = float(os.getenv("CHANGE_DETECTION_MAX_AGE", "3600"))
+
+# REST resources probed for each kind of result. The repo list's ETag moves
+# with stars, forks, issue counts and pushes on any of the first 100 repos;
+# the events feed moves on every push.
+PROFILE_PROBE = "/users/{username}"
+REPOS_PROBE = "/users/{username}/repos?type=owner&sort=pushed&per_page=100"
+EVENTS_PROBE = "/users/{username}/events/public?per_page=1"
+
+CONDITIONAL_PROBES = Counter(
+    "github_conditional_probes_total", "Conditional REST probes by outcome.", labelnames=("result",)
+)
+REVALIDATIONS = Counter(
+    "github_revalidations_total", "Cached results revalidated through ETag probes.", labelnames=("result",)
+)
+
+
+class ChangeDetector:
+    """Remembers per-result ETags and revalidates results with conditional requests."""
+
+    def __init__(self, max_keys=CHANGE_DETECTION_MAX_KEYS, max_age=CHANGE_DETECTION_MAX_AGE,
+                 enabled=GITHUB_CONDITIONAL_PROBES):
+        self.max_keys = max_keys
+        self.max_age = max_age
+        self.enabled = enabled
+        self._validators = OrderedDict()  # cache key -> (computed_at, {probe path: etag})
+        self._probes = SingleFlight()
+
+    async def _probe(self, path, etag=None):
+        # Results sharing a probe (e.g. the repo list) send it only once
+        return await self._probes.do((path, etag), lambda: self._send_probe(path, etag))
+
+    async def _send_probe(self, path, etag):
+        """Return (unchanged, etag) for one REST resource; errors count as changed."""
+        try:
+            response = await github_client.rest_get(path, etag=etag)
+        except Exception as e:
+            logger.warning(f"Change probe failed for {path}: {str(e)}")
+            CONDITIONAL_PROBES.inc(result="error")
+            return False, None
+
+        if response.status_code == 304:
+            CONDITIONAL_PROBES.inc(result="not_modified")
+            return True, etag
+        if response.status_code == 200:
+            CONDITIONAL_PROBES.inc(result="modified")
+            return False, response.headers.get("etag")
+        CONDITIONAL_PROBES.inc(result="error")
+        logger.debug("Change probe for %s returned %s", path, response.status_code)
+        return False, None
+
+    async def _probe_all(self, paths, validators):
+        results = await asyncio.gather(*(self._probe(path, validators.get(path)) for path in paths))
+        unchanged = all(result[0] for result in results)
+        etags = {path: etag for path, (_, etag) in zip(paths, results)}
+        return unchanged, etags
+
+    def _remember(self, key, etags):
+        if any(etag is None for etag in etags.values()):
+            # A result without a full set of validators can't be revalidated later
+            self._validators.pop(key, None)
+            return
+        self._validators[key] = (time.monotonic(), etags)
+        self._validators.move_to_end(key)
+        while len(self._validators) > self.max_keys:
+            self._validators.popitem(last=False)
+
+    def forget(self, key):
+        self._validators.pop(key, None)
+
+    def forget_prefix(self, prefix):
+        for key in [key for key in self._validators if key.startswith(prefix)]:
+            del self._validators[key]
+
+    async def revalidate(self, key, probes, compute, previous):
+        """Return previous() if every probe is unchanged since it was computed, else compute().
+
+        probes are REST paths; previous returns the last good result for key,
+        or None. The ETags seen here become the validators for the new result.
+        """
+        if not self.enabled or not probes:
+            return await compute()
+
+        old = previous()
+        computed_at, validators = self._validators.get(key, (None, None))
+        if (
+            old is not None
+            and validators is not None
+            and set(validators) == set(probes)
+            and time.monotonic() - computed_at < self.max_age
+        ):
+            unchanged, etags = await self._probe_all(probes, validators)
+            if unchanged:
+                REVALIDATIONS.inc(result="reused")
+                logger.debug("Reusing %s; GitHub reports no changes", key)
+                self._validators.move_to_end(key)
+                return old
+            REVALIDATIONS.inc(result="changed")
+            value = await compute()
+        else:
+            # First computation (or too old to trust): collect validators
+            # alongside the query rather than before it, so a cold request
+            # doesn't wait on the probes. A change landing between the two
+            # can be missed, but only until max_age forces a recompute.
+            REVALIDATIONS.inc(result="cold")
+            (_, etags), value = await asyncio.gather(self._probe_all(probes, {}), compute())
+
+        self._remember(key, etags)
+        return value
+
+    def stats(self):
+        return {"tracked": len(self._validators)}
+
+
+def probes_for(username, *templates):
+    return [template.format(username=username) for template in templates]
+
+
+# Shared by the routers
+CHANGE_DETECTOR = ChangeDetector()
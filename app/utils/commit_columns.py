@@ -0,0 +1,168 @@
+# app/utils/commit_columns.py
+#
+# Commit history held as parallel NumPy columns (epoch day, additions,
+# deletions, repo index) instead of nested dicts, with language/year
+# attribution done as one group-by plus a repo x language weight matrix.
+# NumPy is imported inside the functions that use it, keeping it off the
+# app's import path.
+
+import logging
+import os
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# How a repo's changes are split across its languages: "even" gives every
+# language the same share, "size" splits by the bytes GitHub reports per
+# language on languages.edges
+COMMIT_LANGUAGE_WEIGHTING = os.getenv("COMMIT_LANGUAGE_WEIGHTING", "even")
+WEIGHTINGS = ("even", "size")
+
+
+def epoch_days(dates):
+    """ISO-8601 committedDate strings -> int32 days since 1970-01-01 (UTC)."""
+    import numpy as np
+    # Casting through fixed-width bytes keeps only the YYYY-MM-DD prefix and
+    # parses it in C, much faster than slicing each string in Python
+    return np.array(dates, dtype="S10").astype("datetime64[D]").astype(np.int32)
+
+
+def days_to_years(days):
+    import numpy as np
+    return np.asarray(days, dtype=np.int64).astype("datetime64[D]").astype("datetime64[Y]").astype(np.int32) + 1970
+
+
+def language_edges(repo):
+    """[(language, size)] from a repo node's languages.edges."""
+    return [
+        (edge['node']['name'], edge.get('size') or 0)
+        for edge in (repo.get('languages') or {}).get('edges', [])
+    ]
+
+
+def weight_matrix(repo_languages, weighting=COMMIT_LANGUAGE_WEIGHTING):
+    """Return (languages, weights) where weights[r, l] is repo r's share for language l.
+
+    Rows sum to 1, or 0 for repos without languages. Size weighting falls
+    back to even shares when every size for a repo is 0.
+    """
+    import numpy as np
+    if weighting not in WEIGHTINGS:
+        raise ValueError(f"Unknown language weighting: {weighting}")
+
+    languages = sorted({language for edges in repo_languages for language, _ in edges})
+    columns = {language: index for index, language in enumerate(languages)}
+    weights = np.zeros((len(repo_languages), len(languages)))
+    for row, edges in enumerate(repo_languages):
+        if not edges:
+            continue
+        sizes = np.array([size for _, size in edges], dtype=np.float64)
+        if weighting == "size" and sizes.sum() > 0:
+            shares = sizes / sizes.sum()
+        else:
+            shares = np.full(len(edges), 1 / len(edges))
+        for (language, _), share in zip(edges, shares):
+            weights[row, columns[language]] += share
+    return languages, weights
+
+
+def attribute_usage(repo_languages, years, changes, weighting=COMMIT_LANGUAGE_WEIGHTING):
+    """Split a repo x year matrix of changed lines across languages.
+
+    Returns {language: {year: size}} with only the non-zero cells.
+    """
+    import numpy as np
+    languages, weights = weight_matrix(repo_languages, weighting)
+    usage = {}
+    if not languages or not len(years):
+        return usage
+
+    totals = weights.T @ changes  # language x year
+    for language_index, row in enumerate(totals):
+        nonzero = np.nonzero(row)[0]
+        if len(nonzero):
+            usage[languages[language_index]] = {int(years[index]): float(row[index]) for index in nonzero}
+    return usage
+
+
+class CommitColumns:
+    """Append-only columnar commit log for many repos, 16 bytes per commit.
+
+    Columns grow by doubling, so appending a page is amortized O(page).
+    """
+
+    def __init__(self, capacity=1024):
+        import numpy as np
+        self._days = np.empty(capacity, dtype=np.int32)
+        self._additions = np.empty(capacity, dtype=np.int32)
+        self._deletions = np.empty(capacity, dtype=np.int32)
+        self._repos = np.empty(capacity, dtype=np.int32)
+        self._size = 0
+        self.repo_names = []
+        self.repo_languages = []
+
+    @property
+    def commits(self):
+        return self._size
+
+    def __len__(self):
+        return self._size
+
+    def add_repo(self, repo):
+        """Register a repo node (with its languages.edges) and return its index."""
+        self.repo_names.append(repo.get('name'))
+        self.repo_languages.append(language_edges(repo))
+        return len(self.repo_names) - 1
+
+    def _reserve(self, count):
+        import numpy as np
+        needed = self._size + count
+        if needed <= len(self._days):
+            return
+        capacity = max(needed, 2 * len(self._days))
+        for name in ("_days", "_additions", "_deletions", "_repos"):
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            setattr(self, name, grown)
+
+    def add_commits(self, repo_index, commits):
+        """Append one page of commit nodes (committedDate, additions, deletions)."""
+        count = len(commits)
+        if not count:
+            return
+        self._reserve(count)
+        end = self._size + count
+        self._days[self._size:end] = epoch_days([commit['committedDate'] for commit in commits])
+        self._additions[self._size:end] = [commit.get('additions') or 0 for commit in commits]
+        self._deletions[self._size:end] = [commit.get('deletions') or 0 for commit in commits]
+        self._repos[self._size:end] = repo_index
+        self._size = end
+
+    def year_changes(self):
+        """Return (years, changes) with changes[r, y] the lines changed in repo r in years[y]."""
+        import numpy as np
+        repo_count = len(self.repo_names)
+        if not self._size:
+            return np.empty(0, dtype=np.int32), np.zeros((repo_count, 0))
+
+        years = days_to_years(self._days[:self._size])
+        first_year = int(years.min())
+        span = int(years.max()) - first_year + 1
+        changes = self._additions[:self._size].astype(np.int64) + self._deletions[:self._size]
+
+        # One group-by over (repo, year) cells
+        cells = self._repos[:self._size].astype(np.int64) * span + (years - first_year)
+        totals = np.bincount(cells, weights=changes, minlength=repo_count * span)
+        return np.arange(first_year, first_year + span, dtype=np.int32), totals.reshape(repo_count, span)
+
+    def repo_year_totals(self, repo_index):
+        """{year: changed lines} for one repo, skipping empty years."""
+        years, changes = self.year_changes()
+        row = changes[repo_index] if len(years) else ()
+        return {int(year): int(total) for year, total in zip(years, row) if total}
+
+    def usage(self, weighting=COMMIT_LANGUAGE_WEIGHTING):
+        """{language: {year: size}} over every commit appended so far."""
+        years, changes = self.year_changes()
+        return attribute_usage(self.repo_languages, years, changes, weighting)
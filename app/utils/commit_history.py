@@ -0,0 +1,265 @@
+# app/utils/commit_history.py
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+from app.utils import github_client
+from app.utils.commit_columns import (
+    CommitColumns,
+    COMMIT_LANGUAGE_WEIGHTING,
+    attribute_usage,
+    language_edges,
+)
+from app.utils.github_queries import REPO_COMMITS_QUERY, REPO_HEADS_QUERY, COMMIT_HISTORY_QUERY
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# 0 means no limit: walk every owned repo and every commit
+MAX_REPOS = int(os.getenv("COMMIT_HISTORY_MAX_REPOS", "0"))
+MAX_COMMITS_PER_REPO = int(os.getenv("COMMIT_HISTORY_MAX_COMMITS", "0"))
+# How many repos have history pages in flight at once for one user
+REPO_CONCURRENCY = int(os.getenv("COMMIT_HISTORY_CONCURRENCY", "8"))
+# Ignore commits older than this many days (0 = full history)
+HORIZON_DAYS = int(os.getenv("COMMIT_HISTORY_HORIZON_DAYS", "0"))
+
+def default_since():
+    # A date rather than a datetime, so the horizon (and every cache key built
+    # from it) only moves once a day
+    if not HORIZON_DAYS:
+        return None
+    return (datetime.now(timezone.utc) - timedelta(days=HORIZON_DAYS)).date()
+
+def _format_since(since):
+    # GitTimestamp is ISO-8601; accept dates as well as datetimes
+    if since is None:
+        return None
+    if not isinstance(since, datetime):
+        since = datetime(since.year, since.month, since.day, tzinfo=timezone.utc)
+    return since.isoformat()
+
+def _history(repo):
+    # Walk defaultBranchRef.target.history, which is missing for empty repos
+    default_branch_ref = repo.get('defaultBranchRef')
+    if not default_branch_ref:
+        logger.warning(f"No default branch ref found for repo: {repo.get('name')}")
+        return None
+
+    target = default_branch_ref.get('target')
+    if not target:
+        logger.warning(f"No target found for default branch ref in repo: {repo.get('name')}")
+        return None
+
+    history = target.get('history')
+    if not history:
+        logger.warning(f"No commit history found for repo: {repo.get('name')}")
+        return None
+
+    return history
+
+class HistoryRewritten(Exception):
+    """The watermark commit is no longer on the default branch (e.g. after a force push)."""
+
+def _head(repo):
+    default_branch_ref = repo.get('defaultBranchRef') or {}
+    target = default_branch_ref.get('target') or {}
+    if not target.get('oid'):
+        return None
+    return target['committedDate'], target['oid']
+
+async def iter_repositories(username, max_repos=MAX_REPOS, since=None, query=REPO_COMMITS_QUERY):
+    """Yield pages of the user's repositories, with languages and first history page."""
+    after = None
+    seen = 0
+    while not max_repos or seen < max_repos:
+        variables = {"username": username, "after": after}
+        if query is REPO_COMMITS_QUERY:
+            variables["since"] = _format_since(since)
+        data = await github_client.graphql_query(query, variables)
+        github_client.raise_for_graphql_errors(data)
+
+        user = (data.get("data") or {}).get("user")
+        if user is None:
+            logger.error(f"No user data found for {username}")
+            raise HTTPException(status_code=404, detail="User not found")
+
+        connection = user['repositories']
+        repos = connection['nodes']
+        if max_repos:
+            repos = repos[:max_repos - seen]
+        seen += len(repos)
+        yield repos
+
+        page_info = connection['pageInfo']
+        if not page_info['hasNextPage']:
+            return
+        after = page_info['endCursor']
+
+async def iter_repo_commits(repo, max_commits=MAX_COMMITS_PER_REPO, since=None):
+    """Yield pages of commit nodes for one repo, following history cursors."""
+    history = _history(repo)
+    if history is None:
+        return
+
+    nodes = history['nodes']
+    if max_commits:
+        nodes = nodes[:max_commits]
+    fetched = len(nodes)
+    yield nodes
+
+    page_info = history['pageInfo']
+    while page_info['hasNextPage'] and (not max_commits or fetched < max_commits):
+        variables = {
+            "owner": repo['owner']['login'],
+            "name": repo['name'],
+            "after": page_info['endCursor'],
+            "since": _format_since(since),
+        }
+        data = await github_client.graphql_query(COMMIT_HISTORY_QUERY, variables)
+        github_client.raise_for_graphql_errors(data)
+
+        history = _history((data.get("data") or {}).get("repository") or {})
+        if history is None:
+            return
+
+        nodes = history['nodes']
+        if max_commits:
+            nodes = nodes[:max_commits - fetched]
+        fetched += len(nodes)
+        yield nodes
+        page_info = history['pageInfo']
+
+async def iter_new_commits(repo, watermark=None):
+    """Yield pages of commits newer than watermark=(committedDate, oid), newest first.
+
+    Raises HistoryRewritten if the watermark commit is never reached.
+    """
+    since, last_oid = watermark or (None, None)
+    after = None
+    while True:
+        variables = {
+            "owner": repo['owner']['login'],
+            "name": repo['name'],
+            "after": after,
+            "since": since,
+        }
+        data = await github_client.graphql_query(COMMIT_HISTORY_QUERY, variables)
+        github_client.raise_for_graphql_errors(data)
+
+        history = _history((data.get("data") or {}).get("repository") or {})
+        if history is None:
+            return
+
+        nodes = history['nodes']
+        oids = [node['oid'] for node in nodes]
+        if last_oid in oids:
+            # history(since:) is inclusive, so stop at the commit we already counted
+            yield nodes[:oids.index(last_oid)]
+            return
+        yield nodes
+
+        if not history['pageInfo']['hasNextPage']:
+            break
+        after = history['pageInfo']['endCursor']
+
+    if last_oid is not None:
+        raise HistoryRewritten(f"{repo['owner']['login']}/{repo['name']} no longer contains {last_oid}")
+
+async def ingest_commit_history(username, columns, since=None, max_repos=MAX_REPOS,
+                                max_commits=MAX_COMMITS_PER_REPO, concurrency=REPO_CONCURRENCY):
+    """Walk every history page of every owned repo into a CommitColumns.
+
+    Repos are walked concurrently, at most `concurrency` at a time, and the
+    repositories connection is only paged as walkers free up. Each page is
+    appended to the columns and the parsed nodes dropped, so memory grows by
+    16 bytes per commit.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def walk(repo):
+        try:
+            repo_index = columns.add_repo(repo)
+            async for commits in iter_repo_commits(repo, max_commits=max_commits, since=since):
+                columns.add_commits(repo_index, commits)
+        finally:
+            semaphore.release()
+
+    tasks = []
+    try:
+        async for repos in iter_repositories(username, max_repos=max_repos, since=since):
+            for repo in repos:
+                # Backpressure: don't page further through repositories than we can walk
+                await semaphore.acquire()
+                tasks.append(asyncio.create_task(walk(repo)))
+        await asyncio.gather(*tasks)
+    finally:
+        # Don't leave orphaned page walkers behind if one of them failed
+        for task in tasks:
+            task.cancel()
+
+    logger.info(f"Ingested {columns.commits} commits across {len(tasks)} repos for {username}")
+    return columns
+
+async def sync_commit_history(username, store, concurrency=REPO_CONCURRENCY, weighting=COMMIT_LANGUAGE_WEIGHTING):
+    """Bring the persisted per-repo totals for username up to date and return them.
+
+    Repos whose head commit matches the stored watermark cost nothing beyond
+    the repository listing; changed repos only fetch commits newer than the
+    watermark via history(since:), and new or rewritten repos are walked in
+    full. Returns {language: {year: size}} using the repos' current languages.
+    """
+    watermarks = await asyncio.to_thread(store.get_watermarks, username)
+    semaphore = asyncio.Semaphore(concurrency)
+    repo_names = []
+    repo_languages = []
+
+    async def sync_repo(repo, watermark):
+        try:
+            replace = False
+            try:
+                year_changes, newest = await _collect_new_commits(repo, watermark)
+            except HistoryRewritten as exc:
+                logger.warning(f"Rebuilding commit totals: {exc}")
+                replace = True
+                year_changes, newest = await _collect_new_commits(repo, None)
+
+            await asyncio.to_thread(
+                store.merge_repo, username, repo['name'], year_changes, newest or watermark,
+                expected_watermark=watermark, replace=replace,
+            )
+        finally:
+            semaphore.release()
+
+    tasks = []
+    try:
+        async for repos in iter_repositories(username, query=REPO_HEADS_QUERY):
+            for repo in repos:
+                repo_names.append(repo['name'])
+                repo_languages.append(language_edges(repo))
+                head = _head(repo)
+                watermark = watermarks.get(repo['name'])
+                if head is None or (watermark and watermark[1] == head[1]):
+                    continue
+                await semaphore.acquire()
+                tasks.append(asyncio.create_task(sync_repo(repo, watermark)))
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    logger.info(f"Synced {len(tasks)} of {len(repo_names)} repos for {username}")
+    # Only count repos the user still owns
+    years, changes = await asyncio.to_thread(store.load_year_changes, username, repo_names)
+    return attribute_usage(repo_languages, years, changes, weighting)
+
+async def _collect_new_commits(repo, watermark):
+    columns = CommitColumns()
+    repo_index = columns.add_repo(repo)
+    newest = None
+    async for commits in iter_new_commits(repo, watermark):
+        if newest is None and commits:
+            newest = (commits[0]['committedDate'], commits[0]['oid'])
+        columns.add_commits(repo_index, commits)
+    return columns.repo_year_totals(repo_index), newest
@@ -0,0 +1,160 @@
+# app/utils/commit_store.py
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+COMMIT_STORE_PATH = os.getenv("COMMIT_STORE_PATH", "commit_store.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS repo_watermarks (
+    owner TEXT NOT NULL,
+    repo TEXT NOT NULL,
+    last_commit_date TEXT NOT NULL,
+    last_oid TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (owner, repo)
+);
+CREATE TABLE IF NOT EXISTS repo_year_changes (
+    owner TEXT NOT NULL,
+    repo TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    changes INTEGER NOT NULL,
+    PRIMARY KEY (owner, repo, year)
+);
+"""
+
+
+class CommitStore:
+    """Per-repo yearly changed-line totals plus the newest commit already counted.
+
+    Totals are stored before language attribution, so the weighting can be
+    chosen (and languages can change) without re-walking history.
+
+    Methods are blocking; call them through asyncio.to_thread from async code.
+    """
+
+    def __init__(self, path=COMMIT_STORE_PATH):
+        self.path = path
+        # The file is opened and migrated on first use, not at import
+        self._ready = False
+        self._ready_lock = threading.Lock()
+
+    def _prepare(self, conn):
+        with self._ready_lock:
+            if not self._ready:
+                conn.executescript(SCHEMA)
+                self._migrate(conn)
+                self._ready = True
+
+    def _migrate(self, conn):
+        # Older stores kept totals already split per language; drop them and
+        # their watermarks so the next sync rebuilds every repo once
+        legacy = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'repo_language_years'"
+        ).fetchone()
+        if legacy:
+            logger.info("Migrating commit store to per-repo yearly totals; history will be re-synced")
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DROP TABLE repo_language_years")
+            conn.execute("DELETE FROM repo_watermarks")
+            conn.execute("COMMIT")
+
+    @contextmanager
+    def _connect(self):
+        # Autocommit mode; multi-statement writes open their own transaction
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            if not self._ready:
+                self._prepare(conn)
+            yield conn
+        finally:
+            conn.close()
+
+    def get_watermarks(self, owner):
+        """Return {repo: (last_commit_date, last_oid)} for an owner."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT repo, last_commit_date, last_oid FROM repo_watermarks WHERE owner = ?",
+                (owner.lower(),),
+            ).fetchall()
+        return {repo: (last_commit_date, last_oid) for repo, last_commit_date, last_oid in rows}
+
+    def merge_repo(self, owner, repo, year_changes, watermark, expected_watermark=None, replace=False):
+        """Add year_changes {year: changed lines} to a repo's totals and advance its watermark.
+
+        The merge only applies if the stored watermark still matches
+        expected_watermark, so two refreshes racing on the same repo can't
+        count the same commits twice. Returns whether the merge was applied.
+        """
+        owner = owner.lower()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT last_commit_date, last_oid FROM repo_watermarks WHERE owner = ? AND repo = ?",
+                (owner, repo),
+            ).fetchone()
+            if not replace and row != (tuple(expected_watermark) if expected_watermark else None):
+                logger.info(f"Skipping merge for {owner}/{repo}: watermark moved concurrently")
+                conn.execute("ROLLBACK")
+                return False
+
+            if replace:
+                conn.execute("DELETE FROM repo_year_changes WHERE owner = ? AND repo = ?", (owner, repo))
+
+            conn.executemany(
+                """
+                INSERT INTO repo_year_changes (owner, repo, year, changes)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (owner, repo, year) DO UPDATE SET changes = changes + excluded.changes
+                """,
+                [(owner, repo, year, changes) for year, changes in year_changes.items()],
+            )
+            if watermark:
+                conn.execute(
+                    """
+                    INSERT INTO repo_watermarks (owner, repo, last_commit_date, last_oid, updated_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (owner, repo) DO UPDATE SET
+                        last_commit_date = excluded.last_commit_date,
+                        last_oid = excluded.last_oid,
+                        updated_at = excluded.updated_at
+                    """,
+                    (owner, repo, watermark[0], watermark[1], time.time()),
+                )
+            conn.execute("COMMIT")
+        return True
+
+    def load_year_changes(self, owner, repos):
+        """Return (years, changes) where changes[r, y] is repos[r]'s changed lines in years[y]."""
+        import numpy as np
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT repo, year, changes FROM repo_year_changes WHERE owner = ?", (owner.lower(),)
+            ).fetchall()
+
+        index = {repo: row for row, repo in enumerate(repos)}
+        rows = [(index[repo], year, changes) for repo, year, changes in rows if repo in index]
+        if not rows:
+            return np.empty(0, dtype=np.int32), np.zeros((len(repos), 0))
+
+        repo_rows, years, changes = (np.array(column) for column in zip(*rows))
+        first_year = int(years.min())
+        span = int(years.max()) - first_year + 1
+        matrix = np.zeros((len(repos), span))
+        np.add.at(matrix, (repo_rows, years - first_year), changes)
+        return np.arange(first_year, first_year + span, dtype=np.int32), matrix
+
+    def delete_owner(self, owner):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM repo_year_changes WHERE owner = ?", (owner.lower(),))
+            conn.execute("DELETE FROM repo_watermarks WHERE owner = ?", (owner.lower(),))
+            conn.execute("COMMIT")
@@ -0,0 +1,126 @@
+# app/utils/deadlines.py
+#
+# End-to-end time budgets for requests. A route opens a deadline and
+# everything it awaits reads the time left from a context variable: GitHub
+# queries and OpenAI completions cap their own timeouts to it, retries that
+# could not finish in time are skipped, and work still running when it
+# expires is cancelled. Tasks inherit the deadline of the request that
+# created them, so shared in-flight work is bounded the same way.
+
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from contextlib import contextmanager
+from fastapi import HTTPException
+from app.utils.metrics import Counter
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Seconds a request may take end to end (0 disables the budget)
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "25"))
+# Time held back from optional work (the LLM analysis) so a degraded
+# response can still be assembled before the request deadline itself
+DEADLINE_RESERVE = float(os.getenv("DEADLINE_RESERVE", "0.5"))
+
+# Absolute time.monotonic() the current request must finish by, or None
+_expires_at = contextvars.ContextVar("request_deadline", default=None)
+
+DEADLINES_EXCEEDED = Counter(
+    "request_deadlines_exceeded_total", "Operations cut short by the request deadline.", labelnames=("stage",)
+)
+
+
+class DeadlineExceeded(HTTPException):
+    """The request's time budget ran out before `stage` could complete."""
+
+    def __init__(self, stage):
+        super().__init__(status_code=504, detail=f"Request deadline exceeded during {stage}")
+        self.stage = stage
+
+
+class Degraded(Exception):
+    """Carries a partial result that should be returned but never cached."""
+
+    def __init__(self, value):
+        super().__init__("degraded result")
+        self.value = value
+
+
+@contextmanager
+def until(expires_at):
+    """Bound the block to an absolute time.monotonic() deadline (None: unchanged).
+
+    A nested deadline can only shorten the one already in effect.
+    """
+    if expires_at is None:
+        yield
+        return
+    outer = _expires_at.get()
+    if outer is not None:
+        expires_at = min(expires_at, outer)
+    token = _expires_at.set(expires_at)
+    try:
+        yield
+    finally:
+        _expires_at.reset(token)
+
+
+def deadline(seconds=REQUEST_DEADLINE):
+    """Bound the block to `seconds` from now; 0 or less leaves it unbounded."""
+    return until(time.monotonic() + seconds if seconds > 0 else None)
+
+
+def current():
+    return _expires_at.get()
+
+
+def remaining():
+    """Seconds left before the current deadline, or None without one."""
+    expires_at = _expires_at.get()
+    if expires_at is None:
+        return None
+    return max(0.0, expires_at - time.monotonic())
+
+
+def check(stage):
+    left = remaining()
+    if left is not None and left <= 0:
+        DEADLINES_EXCEEDED.inc(stage=stage)
+        raise DeadlineExceeded(stage)
+
+
+def timeout(default, stage):
+    """`default` seconds capped by the time left; raises once nothing is left."""
+    check(stage)
+    left = remaining()
+    return default if left is None else min(default, left)
+
+
+async def sleep(seconds, stage):
+    # A backoff that would outlive the deadline can't lead to a usable answer
+    left = remaining()
+    if left is not None and seconds >= left:
+        DEADLINES_EXCEEDED.inc(stage=stage)
+        raise DeadlineExceeded(stage)
+    await asyncio.sleep(seconds)
+
+
+async def run(awaitable, stage, reserve=0.0):
+    """Await `awaitable`, cancelling it `reserve` seconds before the deadline."""
+    left = remaining()
+    if left is None:
+        return await awaitable
+    if left - reserve <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        DEADLINES_EXCEEDED.inc(stage=stage)
+        raise DeadlineExceeded(stage)
+    try:
+        return await asyncio.wait_for(awaitable, left - reserve)
+    except asyncio.TimeoutError:
+        DEADLINES_EXCEEDED.inc(stage=stage)
+        logger.warning(f"Deadline exceeded during {stage}")
+        raise DeadlineExceeded(stage) from None
@@ -1,45 +1,194 @@
 # app/utils/github_client.py
 
 import os
-from dotenv import load_dotenv
-import httpx
 import asyncio
 import logging
+import time
+from app.utils.metrics import GRAPHQL_LATENCY, GRAPHQL_COST, JSON_PARSE_TIME, REST_LATENCY
+from fastapi import HTTPException
+from app.utils import json_utils, deadlines
+from app.utils.github_scheduler import SCHEDULER, current_priority
 
 # Set up logging
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-load_dotenv()
-
 GITHUB_API_URL = "https://api.github.com"
 GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 
-HEADERS = {
-    "Authorization": f"Bearer {GITHUB_TOKEN}",
-    "Accept": "application/vnd.github.v3+json"
-}
-
-# Create a semaphore to limit concurrent GitHub API calls
-GITHUB_SEMAPHORE = asyncio.Semaphore(5)  # Adjust the limit as needed
-
-async def graphql_query(query: str, variables: dict, retries=3, backoff_factor=0.5):
-    async with GITHUB_SEMAPHORE:
-        async with httpx.AsyncClient(timeout=30.0) as client:  # Set a 30s timeout
-            for attempt in range(retries):
-                try:
-                    response = await client.post(
-                        GITHUB_GRAPHQL_URL,
-                        json={"query": query, "variables": variables},
-                        headers=HEADERS
-                    )
-                    response.raise_for_status()
-                    return response.json()
-                except httpx.HTTPStatusError as e:
-                    if e.response.status_code in [502, 504] and attempt < retries - 1:
-                        wait_time = backoff_factor * (2 ** attempt)
-                        logger.warning(f"GitHub API error {e.response.status_code}. Retrying in {wait_time} seconds...")
-                        await asyncio.sleep(wait_time)
-                        continue
-                    raise
+def github_headers():
+    # httpx and python-dotenv are only imported once a client is built, so a
+    # token kept in a .env file is read then rather than at import
+    token = GITHUB_TOKEN
+    if token is None:
+        from dotenv import load_dotenv
+        load_dotenv()
+        token = os.getenv("GITHUB_TOKEN")
+    return {
+        "Authorization": f"Bearer {token}",
+        "Accept": "application/vnd.github.v3+json"
+    }
+
+# Connection pool settings for the shared GitHub client
+GITHUB_HTTP2 = os.getenv("GITHUB_HTTP2", "true").lower() in ("1", "true", "yes")
+GITHUB_MAX_CONNECTIONS = int(os.getenv("GITHUB_MAX_CONNECTIONS", "20"))
+GITHUB_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GITHUB_MAX_KEEPALIVE_CONNECTIONS", "20"))
+GITHUB_KEEPALIVE_EXPIRY = float(os.getenv("GITHUB_KEEPALIVE_EXPIRY", "60"))
+GITHUB_TIMEOUT = float(os.getenv("GITHUB_TIMEOUT", "30"))
+
+# Long-lived client shared by every request; see start_client/close_client
+_client = None
+
+def _http2_available():
+    if not GITHUB_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("HTTP/2 requested but the 'h2' package is not installed; falling back to HTTP/1.1")
+        return False
+    return True
+
+def _build_client():
+    import httpx
+    http2 = _http2_available()
+    limits = httpx.Limits(
+        max_connections=GITHUB_MAX_CONNECTIONS,
+        max_keepalive_connections=GITHUB_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=GITHUB_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        timeout=GITHUB_TIMEOUT,
+        limits=limits,
+        http2=http2,
+        headers=github_headers(),
+    )
+
+def _timeout_error():
+    # The client (and with it httpx) exists by the time a request can time out
+    import httpx
+    return httpx.TimeoutException
+
+def __getattr__(name):
+    # Lets the routers catch github_client.HTTPStatusError without importing
+    # httpx themselves; except clauses only look it up once an error arrives
+    if name == "HTTPStatusError":
+        import httpx
+        return httpx.HTTPStatusError
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def get_client():
+    # Created lazily so scripts that never run the app lifespan still work
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+async def start_client():
+    # Building a client loads the CA bundle, which takes long enough to be
+    # worth doing off the event loop
+    global _client
+    client = await asyncio.to_thread(_build_client)
+    if _client is None or _client.is_closed:
+        _client = client
+    else:
+        # A request got there first and built one inline
+        await client.aclose()
+    logger.info(f"Started shared GitHub client (max_connections={GITHUB_MAX_CONNECTIONS})")
+    return _client
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        logger.info("Closed shared GitHub client")
+
+# Status codes GitHub uses for primary and secondary rate limits
+RATE_LIMIT_STATUSES = (403, 429)
+RETRYABLE_STATUSES = (502, 504)
+
+def _is_rate_limited(response):
+    if response.status_code == 429:
+        return True
+    if response.status_code != 403:
+        return False
+    # Plain 403s (e.g. a bad token) are not worth retrying
+    return (
+        "retry-after" in response.headers
+        or response.headers.get("x-ratelimit-remaining") == "0"
+        or "rate limit" in response.text.lower()
+    )
+
+async def graphql_query(query: str, variables: dict, retries=3, backoff_factor=0.5, priority=None):
+    if priority is None:
+        priority = current_priority.get()
+    client = get_client()
+    for attempt in range(retries):
+        # Only hold a scheduler slot for the request itself, not while backing off
+        async with SCHEDULER.slot(priority):
+            started = time.perf_counter()
+            try:
+                response = await client.post(
+                    GITHUB_GRAPHQL_URL,
+                    json={"query": query, "variables": variables},
+                    # Never wait past the request deadline, even mid-attempt
+                    timeout=deadlines.timeout(GITHUB_TIMEOUT, "github"),
+                )
+            except _timeout_error():
+                deadlines.check("github")
+                raise
+            GRAPHQL_LATENCY.observe(time.perf_counter() - started, status=response.status_code)
+        SCHEDULER.observe_headers(response.headers)
+
+        if attempt < retries - 1:
+            if response.status_code in RATE_LIMIT_STATUSES and _is_rate_limited(response):
+                wait_time = SCHEDULER.backoff(attempt, response.headers, backoff_factor)
+                logger.warning(f"GitHub rate limit hit ({response.status_code}). Retrying in {wait_time:.1f} seconds...")
+                await deadlines.sleep(wait_time, "github")
+                continue
+            if response.status_code in RETRYABLE_STATUSES:
+                wait_time = backoff_factor * (2 ** attempt)
+                logger.warning(f"GitHub API error {response.status_code}. Retrying in {wait_time} seconds...")
+                await deadlines.sleep(wait_time, "github")
+                continue
+
+        response.raise_for_status()
+        with JSON_PARSE_TIME.time(source="github"):
+            data = json_utils.loads(response.content)
+
+        rate_limit = (data.get("data") or {}).get("rateLimit")
+        SCHEDULER.observe_rate_limit(rate_limit)
+        if rate_limit and rate_limit.get("cost") is not None:
+            GRAPHQL_COST.observe(rate_limit["cost"])
+        return data
+
+async def rest_get(path: str, etag=None):
+    """GET a REST API path, sending If-None-Match when an ETag is given.
+
+    Returns the response without raising; a 304 means the resource is
+    unchanged and isn't charged against the REST rate limit.
+    """
+    headers = {"If-None-Match": etag} if etag else {}
+    # REST calls draw on the core budget, not GraphQL points, so they skip
+    # the local scheduler (and its headers). GitHub's secondary rate limit
+    # counts concurrent REST and GraphQL requests together, though, so they
+    # share the deployment-wide concurrency limit with GraphQL
+    global_limiter = SCHEDULER.global_limiter
+    lease = await global_limiter.acquire()
+    try:
+        started = time.perf_counter()
+        response = await get_client().get(
+            f"{GITHUB_API_URL}{path}", headers=headers, timeout=deadlines.timeout(GITHUB_TIMEOUT, "github")
+        )
+    finally:
+        await global_limiter.release(lease)
+    REST_LATENCY.observe(time.perf_counter() - started, status=response.status_code)
+    return response
+
+def raise_for_graphql_errors(data):
+    if 'errors' in data:
+        error_message = data['errors'][0].get('message', 'Unknown error')
+        logger.error(f"GitHub API error: {error_message}")
+        raise HTTPException(status_code=400, detail=f"GitHub API error: {error_message}")
@@ -0,0 +1,212 @@
+# app/utils/github_queries.py
+#
+# Builds the GraphQL documents sent to GitHub so each route only selects
+# the fields it actually reads. The user/repository queries are assembled
+# once at import time from the field sets below.
+
+RATE_LIMIT_FIELDS = """
+      rateLimit {
+        cost
+        remaining
+        resetAt
+      }"""
+
+# Fields read by extract_user_profile
+PROFILE_FIELDS = """
+        login
+        name
+        avatarUrl
+        bio
+        createdAt
+        followers {
+          totalCount
+        }
+        following {
+          totalCount
+        }"""
+
+# Fields read by calculate_key_metrics and the ownership filter
+REPO_METRIC_FIELDS = """
+            name
+            stargazerCount
+            forkCount
+            openIssues: issues(states: OPEN) {
+              totalCount
+            }
+            closedIssues: issues(states: CLOSED) {
+              totalCount
+            }
+            watchers {
+              totalCount
+            }
+            owner {
+              login
+            }
+            isFork"""
+
+# Fields needed to attribute commit changes to languages
+REPO_LANGUAGE_FIELDS = """
+            name
+            owner {
+              login
+            }
+            languages(first: 10) {
+              edges {
+                size
+                node {
+                  name
+                }
+              }
+            }"""
+
+# Newest commit on the default branch, used to skip unchanged repos
+HEAD_COMMIT_FIELDS = """
+            defaultBranchRef {
+              target {
+                ... on Commit {
+                  oid
+                  committedDate
+                }
+              }
+            }"""
+
+COMMIT_FIELDS = """
+                        oid
+                        committedDate
+                        additions
+                        deletions"""
+
+# Commits per history page; GitHub caps connections at 100 nodes
+COMMIT_PAGE_SIZE = 100
+
+
+def history_selection(first=COMMIT_PAGE_SIZE, cursor_variable=None, since_variable=None):
+    after = f", after: ${cursor_variable}" if cursor_variable else ""
+    since = f", since: ${since_variable}" if since_variable else ""
+    return f"""
+            defaultBranchRef {{
+              target {{
+                ... on Commit {{
+                  history(first: {first}{after}{since}) {{
+                    pageInfo {{
+                      hasNextPage
+                      endCursor
+                    }}
+                    nodes {{{COMMIT_FIELDS}
+                    }}
+                  }}
+                }}
+              }}
+            }}"""
+
+
+def _user_selections(include_profile, repo_fields, repos_first, after):
+    selections = [PROFILE_FIELDS] if include_profile else []
+    if repo_fields:
+        selections.append(f"""
+        repositories(
+          first: {repos_first},
+          ownerAffiliations: OWNER,
+          isFork: false,
+          orderBy: {{ field: STARGAZERS, direction: DESC }}{after}
+        ) {{
+          pageInfo {{
+            hasNextPage
+            endCursor
+          }}
+          nodes {{{"".join(repo_fields)}
+          }}
+        }}""")
+    return "".join(selections)
+
+
+def build_user_query(include_profile=True, repo_fields=None, repos_first=20, paginate_repos=False, extra_variables=()):
+    """Return a user(login:) query selecting the profile and/or a repositories page."""
+    variables = ["$username: String!", *extra_variables]
+    after = ""
+    if repo_fields and paginate_repos:
+        variables.append("$after: String")
+        after = ",\n          after: $after"
+
+    return f"""
+    query ({", ".join(variables)}) {{{RATE_LIMIT_FIELDS}
+      user(login: $username) {{{_user_selections(include_profile, repo_fields, repos_first, after)}
+      }}
+    }}
+    """
+
+
+def build_batch_user_query(count, include_profile=False, repo_fields=None, repos_first=20):
+    """Return one query that looks up `count` users as aliases u0..u{count-1}.
+
+    Variables are $u0, $u1, ...; see batch_variables.
+    """
+    variables = ", ".join(f"$u{index}: String!" for index in range(count))
+    selections = _user_selections(include_profile, repo_fields, repos_first, "")
+    users = "".join(
+        f"""
+      u{index}: user(login: $u{index}) {{{selections}
+      }}"""
+        for index in range(count)
+    )
+    return f"""
+    query ({variables}) {{{RATE_LIMIT_FIELDS}{users}
+    }}
+    """
+
+
+def batch_variables(usernames):
+    return {f"u{index}": username for index, username in enumerate(usernames)}
+
+
+def build_commit_history_query(first=COMMIT_PAGE_SIZE):
+    """Return a query for one page of a repository's default-branch history."""
+    return f"""
+    query ($owner: String!, $name: String!, $after: String, $since: GitTimestamp) {{{RATE_LIMIT_FIELDS}
+      repository(owner: $owner, name: $name) {{{history_selection(first, "after", "since")}
+      }}
+    }}
+    """
+
+
+# /user/{username}
+PROFILE_QUERY = build_user_query(include_profile=True)
+
+# /repos/analyze/{username}: every owned repository, 100 per page, for top-K selection
+REPO_METRICS_QUERY = build_user_query(
+    include_profile=False,
+    repo_fields=[REPO_METRIC_FIELDS],
+    repos_first=100,
+    paginate_repos=True,
+)
+
+# /repos/commits/{username}: repositories with their languages and first history page
+REPO_COMMITS_QUERY = build_user_query(
+    include_profile=False,
+    repo_fields=[REPO_LANGUAGE_FIELDS, history_selection(since_variable="since")],
+    repos_first=25,
+    paginate_repos=True,
+    extra_variables=["$since: GitTimestamp"],
+)
+
+# Incremental refresh: repositories with languages and head commit, no history
+REPO_HEADS_QUERY = build_user_query(
+    include_profile=False,
+    repo_fields=[REPO_LANGUAGE_FIELDS, HEAD_COMMIT_FIELDS],
+    repos_first=100,
+    paginate_repos=True,
+)
+
+# GitHub rejects queries requesting more than 500,000 nodes in total
+GITHUB_MAX_NODES = 500000
+# Keep aliased batches small enough to finish well inside GitHub's timeout
+MAX_USERS_PER_BATCH_QUERY = 25
+
+
+def batch_size_for(repos_first):
+    """Users per aliased query for a repositories page of repos_first nodes."""
+    return max(1, min(MAX_USERS_PER_BATCH_QUERY, GITHUB_MAX_NODES // max(1, repos_first)))
+
+
+# Follow-up history pages for a single repository
+COMMIT_HISTORY_QUERY = build_commit_history_query()
@@ -0,0 +1,216 @@
+# app/utils/github_scheduler.py
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from app.utils import global_limiter
+from app.utils.metrics import Gauge, QUEUE_WAIT
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Lower numbers are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+# Priority for GitHub calls made from the current task; background jobs set
+# this once instead of threading a priority argument through every fetch
+current_priority = contextvars.ContextVar("github_priority", default=PRIORITY_INTERACTIVE)
+
+# With GLOBAL_LIMITER_URL set, both limits apply to the whole deployment
+# rather than to each worker process
+GITHUB_MAX_CONCURRENCY = int(os.getenv("GITHUB_MAX_CONCURRENCY", "5"))
+GITHUB_MAX_REQUESTS_PER_MINUTE = int(os.getenv("GITHUB_MAX_REQUESTS_PER_MINUTE", "0"))
+# Start spreading requests out once the point budget drops below this
+GITHUB_MIN_REMAINING = int(os.getenv("GITHUB_MIN_REMAINING", "200"))
+# Never sleep longer than this for pacing or backoff in one go
+GITHUB_MAX_BACKOFF = float(os.getenv("GITHUB_MAX_BACKOFF", "60"))
+
+
+def _parse_reset_at(value):
+    # GraphQL reports resetAt as an ISO timestamp, REST headers as epoch seconds
+    if value is None:
+        return None
+    try:
+        if isinstance(value, str) and not value.isdigit():
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+        return float(value)
+    except ValueError:
+        return None
+
+
+class GitHubScheduler:
+    """Priority queue in front of every GitHub call that paces by the rate limit budget."""
+
+    def __init__(self, max_concurrency=GITHUB_MAX_CONCURRENCY, min_remaining=GITHUB_MIN_REMAINING,
+                 rate_per_minute=GITHUB_MAX_REQUESTS_PER_MINUTE):
+        self.max_concurrency = max_concurrency
+        self.min_remaining = min_remaining
+        # Shared with the other workers once the local queue has let us through
+        self.global_limiter = global_limiter.limiter("github", max_concurrency, rate_per_minute)
+        self._active = 0
+        self._queue = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+
+        # Latest budget reported by GitHub
+        self.remaining = None
+        self.reset_at = None  # epoch seconds
+        self.last_cost = None
+        self.total_cost = 0
+        # Monotonic time before which no new request may start
+        self.paused_until = 0.0
+
+        self.requests = 0
+        self.rate_limited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def queue_depth(self):
+        return len(self._queue)
+
+    @asynccontextmanager
+    async def slot(self, priority=PRIORITY_INTERACTIVE):
+        await self.acquire(priority)
+        try:
+            lease = await self.global_limiter.acquire()
+            try:
+                yield
+            finally:
+                await self.global_limiter.release(lease)
+        finally:
+            self.release()
+
+    async def acquire(self, priority=PRIORITY_INTERACTIVE):
+        enqueued_at = time.monotonic()
+
+        if self._active < self.max_concurrency and not self._queue:
+            self._active += 1
+        else:
+            entry = (priority, next(self._seq), asyncio.get_running_loop().create_future())
+            heapq.heappush(self._queue, entry)
+            try:
+                await entry[2]
+            except asyncio.CancelledError:
+                if entry in self._queue:
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                elif not entry[2].cancelled():
+                    # We were handed a slot just as we got cancelled; pass it on
+                    self.release()
+                raise
+
+        try:
+            delay = self._pacing_delay()
+            while delay > 0:
+                await asyncio.sleep(delay)
+                delay = self._pacing_delay()
+        except asyncio.CancelledError:
+            self.release()
+            raise
+
+        waited = time.monotonic() - enqueued_at
+        QUEUE_WAIT.observe(waited, limiter="github")
+        self.requests += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def release(self):
+        self._active -= 1
+        while self._queue and self._active < self.max_concurrency:
+            _, _, future = heapq.heappop(self._queue)
+            if future.done():
+                continue
+            self._active += 1
+            future.set_result(None)
+
+    def _pacing_delay(self):
+        now = time.monotonic()
+        if self.paused_until > now:
+            return min(self.paused_until - now, GITHUB_MAX_BACKOFF)
+
+        if self.remaining is None or self.reset_at is None or self.remaining >= self.min_remaining:
+            return 0.0
+
+        reset_in = self.reset_at - time.time()
+        if reset_in <= 0:
+            # The window has rolled over; the next response will refresh the budget
+            self.remaining = None
+            return 0.0
+
+        expected_cost = self.last_cost or 1
+        if self.remaining < expected_cost:
+            return min(reset_in, GITHUB_MAX_BACKOFF)
+
+        # Spread what is left of the budget evenly over the rest of the window
+        return min(reset_in / max(1, self.remaining // expected_cost), GITHUB_MAX_BACKOFF)
+
+    def observe_headers(self, headers):
+        remaining = headers.get("x-ratelimit-remaining")
+        if remaining is not None and remaining.isdigit():
+            self.remaining = int(remaining)
+        reset_at = _parse_reset_at(headers.get("x-ratelimit-reset"))
+        if reset_at is not None:
+            self.reset_at = reset_at
+
+    def observe_rate_limit(self, rate_limit):
+        # rate_limit is the `rateLimit { cost remaining resetAt }` GraphQL node
+        if not rate_limit:
+            return
+        if rate_limit.get("remaining") is not None:
+            self.remaining = rate_limit["remaining"]
+        if rate_limit.get("cost") is not None:
+            self.last_cost = rate_limit["cost"]
+            self.total_cost += rate_limit["cost"]
+        reset_at = _parse_reset_at(rate_limit.get("resetAt"))
+        if reset_at is not None:
+            self.reset_at = reset_at
+
+    def backoff(self, attempt, headers=None, backoff_factor=0.5):
+        """Pause all callers after a 403/429 and return how long this caller should wait."""
+        self.rate_limited += 1
+        headers = headers or {}
+
+        retry_after = headers.get("retry-after")
+        if retry_after is not None and retry_after.isdigit():
+            delay = float(retry_after)
+        elif headers.get("x-ratelimit-remaining") == "0" and self.reset_at is not None:
+            delay = max(0.0, self.reset_at - time.time())
+        else:
+            delay = backoff_factor * (2 ** attempt)
+
+        # Jitter so queued callers don't all retry in the same instant
+        delay = min(delay + random.uniform(0, backoff_factor * (2 ** attempt)), GITHUB_MAX_BACKOFF)
+        self.paused_until = max(self.paused_until, time.monotonic() + delay)
+        return delay
+
+    def stats(self):
+        return {
+            "active": self._active,
+            "queue_depth": self.queue_depth,
+            "max_concurrency": self.max_concurrency,
+            "global_limiter": self.global_limiter.stats(),
+            "requests": self.requests,
+            "rate_limited": self.rate_limited,
+            "avg_wait_seconds": self.total_wait / self.requests if self.requests else 0.0,
+            "max_wait_seconds": self.max_wait,
+            "rate_limit_remaining": self.remaining,
+            "rate_limit_reset_at": self.reset_at,
+            "last_query_cost": self.last_cost,
+            "total_query_cost": self.total_cost,
+        }
+
+
+# Single scheduler shared by every GitHub call in this process
+SCHEDULER = GitHubScheduler()
+
+Gauge("github_scheduler_queue_depth", "GitHub calls waiting for a slot.", lambda: SCHEDULER.queue_depth)
+Gauge("github_scheduler_active", "GitHub calls in flight.", lambda: SCHEDULER._active)
+Gauge("github_rate_limit_remaining", "Last reported GitHub rate limit budget.", lambda: SCHEDULER.remaining)
@@ -0,0 +1,259 @@
+# app/utils/global_limiter.py
+#
+# Concurrency and rate limits enforced across every worker process, so
+# GITHUB_MAX_CONCURRENCY and OPENAI_MAX_CONCURRENCY hold for the whole
+# deployment rather than per process. Leases live in a CacheBackend chosen
+# by GLOBAL_LIMITER_URL (defaulting to SHARED_CACHE_URL):
+#
+#   sqlite:///path/to/file    every worker on one host
+#   redis://host:6379/0       the whole fleet
+#
+# A limit of N is N slot keys; a caller holds one by setting it with
+# set-if-absent and gives it back by overwriting it with a short-lived
+# release marker. Leases expire after GLOBAL_LIMITER_LEASE seconds and are
+# renewed while held, so a crashed worker's slots come back on their own.
+# The optional per-minute rate is enforced the same way, with one key per
+# call started in the current window.
+#
+# Fairness: each process sends only the head of its local queue to compete
+# for global slots, and a process that just freed a slot leaves it to the
+# other processes for one poll interval before taking it back.
+
+import asyncio
+import logging
+import math
+import os
+import random
+import secrets
+import time
+from app.utils import deadlines
+from app.utils.metrics import Counter, Gauge, QUEUE_WAIT
+from app.utils.shared_cache import SHARED_CACHE, SHARED_CACHE_PREFIX, SHARED_CACHE_URL, create_backend
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Empty keeps limits per process
+GLOBAL_LIMITER_URL = os.getenv("GLOBAL_LIMITER_URL", SHARED_CACHE_URL)
+# Seconds a lease survives without renewal, i.e. how long a crashed worker's
+# slots stay taken
+GLOBAL_LIMITER_LEASE = float(os.getenv("GLOBAL_LIMITER_LEASE", "30"))
+# How often the head waiter of each process retries when every slot is taken
+GLOBAL_LIMITER_POLL = float(os.getenv("GLOBAL_LIMITER_POLL", "0.02"))
+
+GLOBAL_ACQUISITIONS = Counter(
+    "global_limiter_acquisitions_total", "Global limiter acquisitions by result.", labelnames=("limiter", "result")
+)
+
+# Identifies this process's leases and release markers
+_PROCESS_ID = f"{os.getpid()}-{secrets.token_hex(4)}"
+_RELEASED = b"released:"
+
+
+class GlobalLimiter:
+    """Cross-process concurrency limit with an optional calls-per-minute rate.
+
+    acquire() returns a lease to pass back to release(). Without a backend,
+    or while it is unreachable, acquire() returns None straight away and only
+    the caller's local limits apply.
+    """
+
+    def __init__(self, name, limit, backend, rate_per_minute=0, prefix=SHARED_CACHE_PREFIX,
+                 lease_ttl=GLOBAL_LIMITER_LEASE, poll=GLOBAL_LIMITER_POLL):
+        self.name = name
+        self.limit = limit
+        self.backend = backend
+        self.rate_per_minute = rate_per_minute
+        self.prefix = f"{prefix}limit:{name}:"
+        self.lease_ttl = lease_ttl
+        self.poll = poll
+        self._turn = None
+        self._held = {}  # slot key -> token
+        self._renewer = None
+        self._releasing = set()  # release tasks still running
+        self._failing = False
+        self.fallbacks = 0
+
+    @property
+    def enabled(self):
+        return self.backend is not None and self.limit > 0
+
+    @property
+    def held(self):
+        return len(self._held)
+
+    async def acquire(self):
+        if not self.enabled:
+            return None
+        started = time.perf_counter()
+        if self._turn is None:
+            self._turn = asyncio.Lock()
+        try:
+            # asyncio.Lock is FIFO, so local waiters keep their order and only
+            # one of them polls the backend at a time
+            async with self._turn:
+                # Rate first: a call start used up while waiting for a slot
+                # only makes the limit stricter, a slot held while waiting
+                # for the rate would sit idle
+                await self._claim_rate()
+                lease = await self._claim_slot()
+        except deadlines.DeadlineExceeded:
+            raise
+        except Exception as e:
+            self.fallbacks += 1
+            GLOBAL_ACQUISITIONS.inc(limiter=self.name, result="fallback")
+            if not self._failing:
+                logger.warning(f"Global {self.name} limiter unavailable, using local limits: {str(e)}")
+            self._failing = True
+            return None
+        if self._failing:
+            logger.info(f"Global {self.name} limiter available again")
+            self._failing = False
+        GLOBAL_ACQUISITIONS.inc(limiter=self.name, result="acquired")
+        QUEUE_WAIT.observe(time.perf_counter() - started, limiter=f"{self.name}_global")
+        return lease
+
+    async def release(self, lease):
+        if lease is None:
+            return
+        key, token = lease
+        self._held.pop(key, None)
+        # Finish giving the slot back even if the caller is cancelled meanwhile
+        await asyncio.shield(self._release_soon(key, token))
+
+    async def _release(self, key, token):
+        try:
+            if await self._owner(key) != token:
+                return
+            # Hand the slot to other processes first; the marker expires
+            # after one poll interval and other processes may clear it sooner
+            await self.backend.set(key, _RELEASED + _PROCESS_ID.encode("ascii"), self.poll)
+        except Exception as e:
+            logger.warning(f"Global {self.name} limiter release failed: {str(e)}")
+
+    async def _owner(self, key):
+        value, _ = await self.backend.get(key)
+        return value
+
+    async def _claim_slot(self):
+        token = f"{_PROCESS_ID}:{secrets.token_hex(4)}".encode("ascii")
+        own_marker = _RELEASED + _PROCESS_ID.encode("ascii")
+        while True:
+            # Start at a random slot so processes don't all race for slot 0
+            first = random.randrange(self.limit)
+            for index in range(self.limit):
+                key = f"{self.prefix}slot:{(first + index) % self.limit}"
+                if await self._try_claim(key, token):
+                    return self._hold(key, token)
+                value = await self._owner(key)
+                if value is not None and value.startswith(_RELEASED) and value != own_marker:
+                    # Freed by another process for whoever is waiting
+                    await self.backend.delete(key, only_if_value=value)
+                    if await self._try_claim(key, token):
+                        return self._hold(key, token)
+            await deadlines.sleep(self.poll * random.uniform(0.5, 1.5), self.name)
+
+    async def _try_claim(self, key, token):
+        claim = asyncio.ensure_future(self.backend.set(key, token, self.lease_ttl, only_if_absent=True))
+        try:
+            return await asyncio.shield(claim)
+        except asyncio.CancelledError:
+            # Cancelled (e.g. by a request deadline) with the set in flight: if
+            # it still succeeds, give the slot straight back rather than leave
+            # it blocked until the lease expires
+            claim.add_done_callback(lambda done: self._abandon(done, key, token))
+            raise
+
+    def _abandon(self, claim, key, token):
+        if claim.cancelled() or claim.exception() is not None or not claim.result():
+            return
+        self._release_soon(key, token)
+
+    def _release_soon(self, key, token):
+        # Keep a reference: nothing else may be waiting on the task
+        task = asyncio.ensure_future(self._release(key, token))
+        self._releasing.add(task)
+        task.add_done_callback(self._releasing.discard)
+        return task
+
+    async def _claim_rate(self):
+        if self.rate_per_minute <= 0:
+            return
+        # Windows of about a second keep bursts at a window boundary small
+        starts = max(1, math.ceil(self.rate_per_minute / 60))
+        window = 60.0 * starts / self.rate_per_minute
+        while True:
+            now = time.time()
+            current = int(now // window)
+            for index in range(starts):
+                key = f"{self.prefix}rate:{current}:{index}"
+                if await self.backend.set(key, b"1", window * 2, only_if_absent=True):
+                    return
+            await deadlines.sleep((current + 1) * window - now, self.name)
+
+    def _hold(self, key, token):
+        self._held[key] = token
+        if self._renewer is None or self._renewer.done():
+            self._renewer = asyncio.create_task(self._renew())
+        return key, token
+
+    async def _renew(self):
+        # Keep held leases alive until they are released
+        while self._held:
+            await asyncio.sleep(self.lease_ttl / 3)
+            for key, token in list(self._held.items()):
+                try:
+                    # Two round trips without scripting; losing the race only
+                    # shortens one lease
+                    if await self._owner(key) == token:
+                        await self.backend.set(key, token, self.lease_ttl)
+                    else:
+                        logger.warning(f"Global {self.name} limiter lost lease {key}")
+                        self._held.pop(key, None)
+                except Exception as e:
+                    logger.warning(f"Global {self.name} limiter renewal failed: {str(e)}")
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "limit": self.limit,
+            "rate_per_minute": self.rate_per_minute,
+            "held": self.held,
+            "fallbacks": self.fallbacks,
+        }
+
+
+def _create_backend(url):
+    # Reuse the shared cache's connections when both point at the same store
+    if url == SHARED_CACHE_URL:
+        return SHARED_CACHE.backend
+    return create_backend(url)
+
+
+BACKEND = _create_backend(GLOBAL_LIMITER_URL)
+
+_LIMITERS = {}
+
+
+def limiter(name, limit, rate_per_minute=0):
+    """Return the process-wide GlobalLimiter called name, creating it once."""
+    if name not in _LIMITERS:
+        _LIMITERS[name] = GlobalLimiter(name, limit, BACKEND, rate_per_minute)
+    return _LIMITERS[name]
+
+
+async def close():
+    for global_limiter in _LIMITERS.values():
+        if global_limiter._renewer is not None:
+            global_limiter._renewer.cancel()
+            global_limiter._renewer = None
+        # The lock belongs to the loop that made it
+        global_limiter._turn = None
+    if BACKEND is not None and BACKEND is not SHARED_CACHE.backend:
+        await BACKEND.close()
+
+
+Gauge(
+    "global_limiter_leases_held", "Global limiter slots held by this process.",
+    lambda: {(name,): global_limiter.held for name, global_limiter in _LIMITERS.items()}, labelnames=("limiter",),
+)
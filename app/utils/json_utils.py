@@ -0,0 +1,47 @@
+# app/utils/json_utils.py
+
+import json
+import logging
+import os
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# orjson is optional; without it (or with FAST_JSON=false) we use the stdlib
+FAST_JSON = os.getenv("FAST_JSON", "true").lower() in ("1", "true", "yes")
+
+orjson = None
+if FAST_JSON:
+    try:
+        import orjson
+    except ImportError:
+        logger.info("orjson not installed; using the standard json module")
+
+def _default(obj):
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def loads(data):
+    """Decode a JSON document from bytes or str."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps(obj):
+    """Encode obj (which may contain pydantic models) to UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse that encodes with orjson when available.
+
+    Returning it from a route skips FastAPI's response_model validation and
+    re-serialization, so routes must build response-shaped data themselves.
+    """
+
+    def render(self, content):
+        return dumps(content)
@@ -0,0 +1,42 @@
+# app/utils/log_utils.py
+
+import logging
+import os
+import random
+import reprlib
+
+# Payload logging is DEBUG-only, sampled, and bounded in size
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.01"))
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "500"))
+
+# reprlib bounds the work done while formatting, not just the output length
+_payload_repr = reprlib.Repr()
+_payload_repr.maxlevel = 4
+_payload_repr.maxdict = 8
+_payload_repr.maxlist = 5
+_payload_repr.maxstring = 80
+_payload_repr.maxother = 80
+
+
+class Truncated:
+    """Defers formatting a payload until a log record is actually emitted."""
+
+    def __init__(self, payload, max_chars=LOG_PAYLOAD_MAX_CHARS):
+        self.payload = payload
+        self.max_chars = max_chars
+
+    def __str__(self):
+        text = _payload_repr.repr(self.payload)
+        if len(text) > self.max_chars:
+            text = f"{text[:self.max_chars]}... [truncated]"
+        return text
+
+
+def log_payload(logger, message, payload, sample_rate=None):
+    """Log a (possibly huge) payload at DEBUG for a sampled fraction of calls."""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    rate = LOG_PAYLOAD_SAMPLE_RATE if sample_rate is None else sample_rate
+    if rate < 1 and random.random() >= rate:
+        return
+    logger.debug("%s: %s", message, Truncated(payload))
@@ -0,0 +1,170 @@
+# app/utils/metrics.py
+#
+# Minimal in-process Prometheus metrics: counters, histograms and gauges
+# read from callbacks at scrape time, rendered in the text exposition
+# format by render(). Kept dependency-free on purpose.
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from sub-millisecond CPU work up to slow LLM calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_REGISTRY = []
+_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, values):
+    if not labelnames:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        _REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self.labelnames = tuple(labelnames)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        _REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with _lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self._series.items()):
+            for bound, count in zip(self.buckets, series):
+                labels = _format_labels(self.labelnames + ("le",), key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose value is read from callback() at scrape time.
+
+    callback returns a number, or a dict mapping label value tuples to numbers.
+    """
+
+    def __init__(self, name, documentation, callback, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+        _REGISTRY.append(self)
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        value = self.callback()
+        values = value if isinstance(value, dict) else {(): value}
+        for key, sample in sorted(values.items()):
+            if sample is None:
+                continue
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(sample)}")
+        return lines
+
+
+def render():
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+
+# Shared instruments, observed from the modules that do the work
+GRAPHQL_LATENCY = Histogram(
+    "github_graphql_request_seconds", "GitHub GraphQL HTTP round trip time.", labelnames=("status",)
+)
+REST_LATENCY = Histogram(
+    "github_rest_request_seconds", "GitHub REST HTTP round trip time.", labelnames=("status",)
+)
+GRAPHQL_COST = Histogram(
+    "github_graphql_cost_points", "GraphQL rate limit points charged per query.",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500),
+)
+JSON_PARSE_TIME = Histogram("json_parse_seconds", "Time spent decoding upstream JSON payloads.", labelnames=("source",))
+SCORING_TIME = Histogram("repo_scoring_seconds", "Time spent computing repo metrics and scores.", labelnames=("path",))
+OPENAI_LATENCY = Histogram("openai_request_seconds", "OpenAI chat completion latency.", labelnames=("mode",))
+OPENAI_TOKENS = Counter("openai_tokens_total", "OpenAI tokens used.", labelnames=("type",))
+QUEUE_WAIT = Histogram("concurrency_wait_seconds", "Time spent waiting for a concurrency slot.", labelnames=("limiter",))
+
+_CACHES = {}
+
+
+def register_cache(name, stats):
+    """Expose a cache's stats() (hits, misses, size/hit_ratio) as gauges labelled cache=name."""
+    _CACHES[name] = stats
+
+
+def _cache_stat(field):
+    def collect():
+        values = {}
+        for name, stats in _CACHES.items():
+            snapshot = stats()
+            if field == "hit_ratio":
+                lookups = snapshot.get("hits", 0) + snapshot.get("misses", 0)
+                values[(name,)] = snapshot.get("hits", 0) / lookups if lookups else 0.0
+            else:
+                values[(name,)] = snapshot.get(field)
+        return values
+    return collect
+
+
+Gauge("cache_hit_ratio", "Cache hits over lookups since start.", _cache_stat("hit_ratio"), labelnames=("cache",))
+Gauge("cache_hits", "Cache hits since start.", _cache_stat("hits"), labelnames=("cache",))
+Gauge("cache_misses", "Cache misses since start.", _cache_stat("misses"), labelnames=("cache",))
+Gauge("cache_entries", "Entries currently held in the cache.", _cache_stat("size"), labelnames=("cache",))
@@ -0,0 +1,208 @@
+# app/utils/refresh_worker.py
+#
+# Stale-while-revalidate support for popular usernames. Routes serve the last
+# good cached result straight away and ask the worker to recompute it; the
+# worker also refreshes frequently requested entries shortly before they
+# expire, so hot profiles rarely pay the GitHub and OpenAI round trip inline.
+
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from app.utils.github_scheduler import current_priority, PRIORITY_BACKGROUND
+from app.utils.metrics import Counter
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+REFRESH_WORKERS = int(os.getenv("REFRESH_WORKERS", "2"))
+# Upper bound on background recomputations started per minute, across workers
+REFRESH_MAX_PER_MINUTE = int(os.getenv("REFRESH_MAX_PER_MINUTE", "30"))
+# A key is hot once it has been requested this many times within the window
+REFRESH_HOT_THRESHOLD = int(os.getenv("REFRESH_HOT_THRESHOLD", "3"))
+REFRESH_HOT_WINDOW = float(os.getenv("REFRESH_HOT_WINDOW", "600"))
+# Hot entries expiring within this many seconds are refreshed ahead of time
+REFRESH_AHEAD = float(os.getenv("REFRESH_AHEAD", "60"))
+REFRESH_SCAN_INTERVAL = float(os.getenv("REFRESH_SCAN_INTERVAL", "15"))
+REFRESH_MAX_TRACKED = int(os.getenv("REFRESH_MAX_TRACKED", "10000"))
+
+# Set inside worker tasks, where a stale dependency must be refetched rather than reused
+_in_refresh = contextvars.ContextVar("in_refresh", default=False)
+
+REFRESHES = Counter("cache_refreshes_total", "Background cache refreshes by outcome.", labelnames=("outcome",))
+
+
+class RefreshWorker:
+    """Bounded pool of background tasks recomputing cached results.
+
+    record() notes a request for a key along with the coroutine function
+    that recomputes and stores it; schedule() queues a refresh. Refreshes
+    run with PRIORITY_BACKGROUND so they yield to interactive GitHub calls.
+    """
+
+    def __init__(self, cache, workers=REFRESH_WORKERS, max_per_minute=REFRESH_MAX_PER_MINUTE,
+                 hot_threshold=REFRESH_HOT_THRESHOLD, hot_window=REFRESH_HOT_WINDOW,
+                 refresh_ahead=REFRESH_AHEAD, scan_interval=REFRESH_SCAN_INTERVAL,
+                 max_tracked=REFRESH_MAX_TRACKED):
+        self.cache = cache
+        self.workers = workers
+        self.max_per_minute = max_per_minute
+        self.hot_threshold = hot_threshold
+        self.hot_window = hot_window
+        self.refresh_ahead = refresh_ahead
+        self.scan_interval = scan_interval
+        self.max_tracked = max_tracked
+        self._requests = OrderedDict()  # key -> deque of request times
+        self._refreshers = {}  # key -> coroutine function recomputing the entry
+        self._queue = asyncio.Queue()
+        self._pending = set()
+        self._spent = deque()  # start times of refreshes in the last minute
+        self._tasks = []
+
+    @property
+    def running(self):
+        return bool(self._tasks)
+
+    def record(self, key, refresh):
+        now = time.monotonic()
+        times = self._requests.get(key)
+        if times is None:
+            times = self._requests[key] = deque()
+        times.append(now)
+        self._requests.move_to_end(key)
+        self._refreshers[key] = refresh
+        self._trim(times, now)
+
+        # Forget the least recently requested keys beyond the tracking bound
+        while len(self._requests) > self.max_tracked:
+            old_key, _ = self._requests.popitem(last=False)
+            self._refreshers.pop(old_key, None)
+
+    def _trim(self, times, now):
+        while times and times[0] <= now - self.hot_window:
+            times.popleft()
+
+    def is_hot(self, key):
+        times = self._requests.get(key)
+        if not times:
+            return False
+        self._trim(times, time.monotonic())
+        return len(times) >= self.hot_threshold
+
+    def hot_keys(self):
+        return [key for key in list(self._requests) if self.is_hot(key)]
+
+    def schedule(self, key):
+        """Queue a refresh for key unless one is already queued or running."""
+        if key in self._pending or key not in self._refreshers:
+            return False
+        self._pending.add(key)
+        self._queue.put_nowait(key)
+        return True
+
+    def _take_budget(self):
+        now = time.monotonic()
+        while self._spent and self._spent[0] <= now - 60:
+            self._spent.popleft()
+        if len(self._spent) >= self.max_per_minute:
+            return False
+        self._spent.append(now)
+        return True
+
+    async def _work(self):
+        # Everything this task calls into GitHub for is background traffic
+        current_priority.set(PRIORITY_BACKGROUND)
+        _in_refresh.set(True)
+        while True:
+            key = await self._queue.get()
+            try:
+                if not self._take_budget():
+                    # Over budget: the stale entry stays until its next request
+                    logger.debug("Refresh budget spent; dropping refresh for %s", key)
+                    REFRESHES.inc(outcome="skipped")
+                    continue
+                refresh = self._refreshers.get(key)
+                if refresh is None:
+                    continue
+                await refresh()
+                REFRESHES.inc(outcome="ok")
+                logger.debug("Refreshed %s in the background", key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Keep serving the last good result; the next request retries
+                REFRESHES.inc(outcome="error")
+                logger.warning(f"Background refresh failed for {key}: {str(e)}")
+            finally:
+                self._pending.discard(key)
+                self._queue.task_done()
+
+    async def _scan(self):
+        while True:
+            await asyncio.sleep(self.scan_interval)
+            for key in self.hot_keys():
+                expires_in = self.cache.expires_in(key)
+                if expires_in is not None and expires_in <= self.refresh_ahead:
+                    self.schedule(key)
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._scan()))
+        logger.info(f"Started {self.workers} cache refresh workers")
+
+    async def stop(self):
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Drop anything still queued; a new loop starts from a clean queue
+        self._queue = asyncio.Queue()
+        self._pending.clear()
+
+    def stats(self):
+        return {
+            "tracked": len(self._requests),
+            "hot": len(self.hot_keys()),
+            "queued": self._queue.qsize(),
+            "pending": len(self._pending),
+        }
+
+
+async def serve_stale(cache, fetches, refresher, key, compute, shared=None):
+    """Return the cached value for key, revalidating stale entries in the background.
+
+    Misses, and stale hits when the worker isn't running or this is itself a
+    refresh, are computed inline through the shared SingleFlight so
+    concurrent callers share one fetch. With a SharedCache, other workers'
+    results are reused and only one of them computes a given key.
+    """
+    async def refresh():
+        if shared is None:
+            value = await compute()
+            cache.set(key, value)
+            return value
+
+        # Refreshing ahead must not pick up a shared entry that is about to expire too
+        min_ttl = refresher.refresh_ahead if _in_refresh.get() else 0
+        value, ttl = await shared.get_or_compute(key, compute, cache.ttl, min_ttl=min_ttl)
+        cache.set(key, value, ttl=min(ttl, cache.ttl))
+        return value
+
+    if not _in_refresh.get():
+        # Lookups made by a refresh don't count towards their key being hot
+        refresher.record(key, lambda: fetches.do(key, refresh))
+    value, fresh = cache.get_stale(key)
+    if value is not None:
+        if fresh:
+            return value
+        if refresher.running and not _in_refresh.get():
+            logger.debug("Serving stale %s while it revalidates", key)
+            refresher.schedule(key)
+            return value
+
+    return await fetches.do(key, refresh)
+
@@ -2,22 +2,117 @@ import os
 import re
 import logging
 import math
-from dotenv import load_dotenv
-from openai import OpenAI
 import asyncio
+import time
+from contextlib import asynccontextmanager
+from app.utils.analysis_cache import AnalysisCache, ANALYSIS_CACHE_TTL
+from app.utils.shared_cache import SHARED_CACHE
+from app.utils import deadlines, global_limiter, json_utils
+from app.utils.log_utils import log_payload
+from app.utils.metrics import OPENAI_LATENCY, OPENAI_TOKENS, QUEUE_WAIT, SCORING_TIME, register_cache, Counter
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load environment variables from .env file
-load_dotenv()
-
-# Get OpenAI API key from environment variables
+# Get OpenAI API key from environment variables; a .env file is read when
+# the client is built
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+OPENAI_MODEL = "gpt-4o-mini"
+SYSTEM_PROMPT = "You are an AI assistant that analyzes GitHub repository metrics and provides insights."
+
+# Client settings; the SDK retries 429/5xx responses with exponential backoff
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "2"))
+# Completions started per minute (0: unlimited); like the concurrency limit it
+# covers every worker when GLOBAL_LIMITER_URL is set
+OPENAI_MAX_REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_MAX_REQUESTS_PER_MINUTE", "0"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+
+# Repos analyzed per completion by generate_repo_analyses; 1 sends one
+# completion per repo
+OPENAI_BATCH_SIZE = int(os.getenv("OPENAI_BATCH_SIZE", "5"))
+
+OPENAI_BATCHES = Counter(
+    "openai_batch_completions_total", "Batched analysis completions by outcome.", labelnames=("result",)
+)
+
 # Create a semaphore to limit concurrent OpenAI API calls
-OPENAI_SEMAPHORE = asyncio.Semaphore(2)  # Adjust the number as needed
+OPENAI_SEMAPHORE = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+# The same limit across processes; a no-op without GLOBAL_LIMITER_URL
+OPENAI_LIMITER = global_limiter.limiter("openai", OPENAI_MAX_CONCURRENCY, OPENAI_MAX_REQUESTS_PER_MINUTE)
+
+# Long-lived client shared by every analysis; see close_openai_client
+_openai_client = None
+
+# Stored analyses, keyed by model, system prompt and the metrics prompt
+ANALYSIS_CACHE = AnalysisCache()
+register_cache("analysis", ANALYSIS_CACHE.stats)
+
+@asynccontextmanager
+async def _openai_slot():
+    # Wait for an OPENAI_SEMAPHORE slot, recording how long that took, then
+    # for a deployment-wide one
+    started = time.perf_counter()
+    async with OPENAI_SEMAPHORE:
+        QUEUE_WAIT.observe(time.perf_counter() - started, limiter="openai")
+        lease = await OPENAI_LIMITER.acquire()
+        try:
+            yield
+        finally:
+            await OPENAI_LIMITER.release(lease)
+
+def _record_usage(usage):
+    if usage is not None:
+        OPENAI_TOKENS.inc(usage.prompt_tokens, type="prompt")
+        OPENAI_TOKENS.inc(usage.completion_tokens, type="completion")
+
+def _build_openai_client():
+    # The SDK is imported here rather than at module level: it takes longer
+    # to import than the rest of the app together, and only analyses need it
+    from openai import AsyncOpenAI
+    api_key = OPENAI_API_KEY
+    if api_key is None:
+        from dotenv import load_dotenv
+        load_dotenv()
+        api_key = os.getenv("OPENAI_API_KEY")
+    return AsyncOpenAI(
+        api_key=api_key,
+        timeout=OPENAI_TIMEOUT,
+        max_retries=OPENAI_MAX_RETRIES,
+    )
+
+def get_openai_client():
+    # Created lazily so a missing API key only fails the analysis, not startup
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = _build_openai_client()
+    return _openai_client
+
+async def start_openai_client():
+    # Import the SDK and build the client off the event loop (see warmup.py)
+    global _openai_client
+    client = await asyncio.to_thread(_build_openai_client)
+    if _openai_client is None:
+        _openai_client = client
+    else:
+        await client.close()
+    return _openai_client
+
+def _request_client():
+    # Inside a request deadline no attempt may outlast the time left; the SDK
+    # keeps its OPENAI_MAX_RETRIES, since the deadline already bounds them all
+    if deadlines.current() is None:
+        return get_openai_client()
+    return get_openai_client().with_options(timeout=deadlines.timeout(OPENAI_TIMEOUT, "openai"))
+
+async def close_openai_client():
+    global _openai_client
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
+        logger.info("Closed shared OpenAI client")
 
 def calculate_key_metrics(repo_data):
     try:
@@ -104,7 +199,7 @@ def compute_overall_score(metrics):
         # Ensure the score is between 0 and 100
         overall_score = min(100, max(0, overall_score))
 
-        logger.info(f"Calculated overall score: {overall_score}")
+        logger.debug("Calculated overall score: %s", overall_score)
         return int(overall_score)
 
     except Exception as e:
@@ -112,78 +207,305 @@ def compute_overall_score(metrics):
         return 0  # Return zero if an error occurs
 
 async def generate_repo_analysis(metrics):
-    try:
-        async with OPENAI_SEMAPHORE:
-            # Run the synchronous OpenAI API call in a thread
-            result = await asyncio.to_thread(_generate_repo_analysis_sync, metrics)
-            return result
+    prompt = build_analysis_prompt(metrics)
+
+    # Reuse a stored analysis when the prompt (or metrics within tolerance) match
+    cached = await _stored_analysis(metrics, prompt, shared=False)
+    if cached is not None:
+        return {
+            "analysis": cached
+        }
 
+    try:
+        # Workers sharing a cache backend make one completion per prompt
+        key = AnalysisCache.make_key(OPENAI_MODEL, SYSTEM_PROMPT, prompt)
+        # Stop short of the request deadline so the metrics can still be returned
+        result, _ = await deadlines.run(
+            SHARED_CACHE.get_or_compute(f"openai:{key}", lambda: _complete_analysis(prompt), ANALYSIS_CACHE_TTL),
+            "openai",
+            reserve=deadlines.DEADLINE_RESERVE,
+        )
+    except deadlines.DeadlineExceeded:
+        logger.warning("No time left to analyze %s; returning metrics only", metrics.get('repo_name', 'Unknown'))
+        return {
+            "analysis": None,
+            "degraded": True
+        }
     except Exception as e:
         logger.exception(f"API call error: {str(e)}")
         # Return default values including all required fields
         return {
-            "analysis": f"Error calling OpenAI API: {str(e)}"
+            "analysis": f"Error calling OpenAI API: {str(e)}",
+            "degraded": True
         }
 
-def _generate_repo_analysis_sync(metrics):
+    # A store that can't be written doesn't cost the completion
+    await _store_analysis(metrics, prompt, result["analysis"], shared=False)
+    return result
+
+async def _complete_analysis(prompt):
+    async with _openai_slot():
+        return await _generate_repo_analysis(prompt)
+
+def _metrics_lines(metrics):
+    return [
+        f"Repository: {metrics.get('repo_name', 'Unknown')}",
+        f"Stars: {metrics.get('stars', 0)}",
+        f"Forks: {metrics.get('forks', 0)}",
+        f"Open Issues: {metrics.get('open_issues', 0)}",
+        f"Closed Issues: {metrics.get('closed_issues', 0)}",
+        f"Watchers: {metrics.get('watchers', 0)}",
+        f"Forks to Stars Ratio: {metrics.get('forks_to_stars_ratio', 0.0):.2f}",
+        f"Issues Resolution Rate: {metrics.get('issues_resolution_rate', 0.0):.2f}",
+        f"Engagement Score: {metrics.get('engagement_score', 0.0):.2f}",
+    ]
+
+ANALYSIS_INSIGHTS = [
+    "Include insights on:",
+    "- Overall repository health and popularity",
+    "- Community engagement and interest",
+    "- Project maintenance and issue management",
+    "- Potential areas for improvement",
+]
+
+def build_analysis_prompt(metrics):
+    # Build the prompt dynamically based on available metrics
+    prompt_lines = _metrics_lines(metrics) + [
+        "",
+        "Analyze the repository based on the metrics above.",
+        "Provide a comprehensive analysis in exactly four sentences, focusing on positive aspects and strengths of the repository.",
+        *ANALYSIS_INSIGHTS,
+    ]
+    return "\n".join(prompt_lines)
+
+def build_batch_prompt(metrics_list):
+    # Every repo's metrics, then the per-repo instructions once
+    prompt_lines = []
+    for metrics in metrics_list:
+        prompt_lines.extend(_metrics_lines(metrics))
+        prompt_lines.append("")
+    prompt_lines += [
+        "Analyze each repository above based on its own metrics.",
+        "For each one, provide a comprehensive analysis in exactly four sentences, focusing on positive aspects and strengths of the repository.",
+        *ANALYSIS_INSIGHTS,
+        "",
+        "Respond with a JSON object whose keys are the repository names exactly as given above and whose values are their analyses.",
+    ]
+    return "\n".join(prompt_lines)
+
+def _batch_response_format(names):
+    # Structured output: exactly one string per repo name
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "repo_analyses",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {name: {"type": "string"} for name in names},
+                "required": list(names),
+                "additionalProperties": False,
+            },
+        },
+    }
+
+def parse_batch_analysis(content, names):
+    """Return {name: analysis} for each expected repo the completion answered."""
     try:
-        # Build the prompt dynamically based on available metrics
-        prompt_lines = [
-            f"Repository: {metrics.get('repo_name', 'Unknown')}",
-            f"Stars: {metrics.get('stars', 0)}",
-            f"Forks: {metrics.get('forks', 0)}",
-            f"Open Issues: {metrics.get('open_issues', 0)}",
-            f"Closed Issues: {metrics.get('closed_issues', 0)}",
-            f"Watchers: {metrics.get('watchers', 0)}",
-            f"Forks to Stars Ratio: {metrics.get('forks_to_stars_ratio', 0.0):.2f}",
-            f"Issues Resolution Rate: {metrics.get('issues_resolution_rate', 0.0):.2f}",
-            f"Engagement Score: {metrics.get('engagement_score', 0.0):.2f}",
-            "",
-            "Analyze the repository based on the metrics above.",
-            "Provide a comprehensive analysis in exactly four sentences, focusing on positive aspects and strengths of the repository.",
-            "Include insights on:",
-            "- Overall repository health and popularity",
-            "- Community engagement and interest",
-            "- Project maintenance and issue management",
-            "- Potential areas for improvement",
-        ]
-        prompt = "\n".join(prompt_lines)
-
-        client = OpenAI(api_key=OPENAI_API_KEY)
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an AI assistant that analyzes GitHub repository metrics and provides insights."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
+        data = json_utils.loads(content)
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {
+        name: data[name].strip()
+        for name in names
+        if isinstance(data.get(name), str) and data[name].strip()
+    }
+
+def _analysis_messages(prompt):
+    return [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+async def _generate_repo_analysis(prompt):
+    # Errors propagate to generate_repo_analysis so failed calls are never cached
+    with OPENAI_LATENCY.time(mode="complete"):
+        response = await _request_client().chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=_analysis_messages(prompt)
         )
+    _record_usage(response.usage)
 
-        content = response.choices[0].message.content.strip()
-        logger.info(f"API response content: {content}")
+    content = response.choices[0].message.content.strip()
+    log_payload(logger, "API response content", content)
 
-        analysis = content
+    analysis = content
 
-        return {
-            "analysis": analysis
-        }
+    return {
+        "analysis": analysis
+    }
 
+async def _stored_analysis(metrics, prompt, shared=True):
+    # The same lookups generate_repo_analysis makes before calling the API;
+    # a store that can't be read counts as a miss. shared=False leaves the
+    # shared cache to SHARED_CACHE.get_or_compute
+    try:
+        cached = await asyncio.to_thread(ANALYSIS_CACHE.get, OPENAI_MODEL, SYSTEM_PROMPT, prompt, metrics)
+        if cached is not None:
+            logger.debug("Analysis cache hit for %s", metrics.get('repo_name', 'Unknown'))
+            return cached
+        if not shared:
+            return None
+        stored, _ = await SHARED_CACHE.get(f"openai:{AnalysisCache.make_key(OPENAI_MODEL, SYSTEM_PROMPT, prompt)}")
+        return stored["analysis"] if stored is not None else None
     except Exception as e:
-        logger.exception(f"API call error: {str(e)}")
-        # Return default values including all required fields
-        return {
-            "analysis": f"Error calling OpenAI API: {str(e)}"
-        }
+        logger.warning(f"Analysis cache lookup failed for {metrics.get('repo_name', 'Unknown')}: {str(e)}")
+        return None
+
+async def _store_analysis(metrics, prompt, analysis, shared=True):
+    # Stored under the single-repo prompt, so every route can reuse it
+    try:
+        await asyncio.to_thread(ANALYSIS_CACHE.set, OPENAI_MODEL, SYSTEM_PROMPT, prompt, metrics, analysis)
+        if shared:
+            key = AnalysisCache.make_key(OPENAI_MODEL, SYSTEM_PROMPT, prompt)
+            await SHARED_CACHE.set(f"openai:{key}", {"analysis": analysis}, ANALYSIS_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"Storing the analysis for {metrics.get('repo_name', 'Unknown')} failed: {str(e)}")
+
+async def _generate_batch_analysis(metrics_list):
+    names = [metrics.get('repo_name', 'Unknown') for metrics in metrics_list]
+    with OPENAI_LATENCY.time(mode="batch"):
+        response = await _request_client().chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=_analysis_messages(build_batch_prompt(metrics_list)),
+            response_format=_batch_response_format(names),
+        )
+    _record_usage(response.usage)
+
+    content = response.choices[0].message.content
+    log_payload(logger, "API batch response content", content)
+    return parse_batch_analysis(content, names)
+
+async def _complete_batch(metrics_list):
+    async with _openai_slot():
+        return await _generate_batch_analysis(metrics_list)
+
+async def _analyze_batch(metrics_list, prompts):
+    """Results for one batched completion; None marks repos it didn't answer."""
+    try:
+        analyses = await deadlines.run(
+            _complete_batch(metrics_list), "openai", reserve=deadlines.DEADLINE_RESERVE
+        )
+    except deadlines.DeadlineExceeded:
+        logger.warning("No time left to analyze %d repos; returning metrics only", len(metrics_list))
+        return [{"analysis": None, "degraded": True} for _ in metrics_list]
+    except Exception as e:
+        logger.warning(f"Batched analysis of {len(metrics_list)} repos failed, falling back to one call per repo: {str(e)}")
+        OPENAI_BATCHES.inc(result="failed")
+        return [None] * len(metrics_list)
+
+    if len(analyses) == len(metrics_list):
+        OPENAI_BATCHES.inc(result="ok")
+    else:
+        # Unparseable output answers no repos; those fall back like a failure
+        OPENAI_BATCHES.inc(result="partial" if analyses else "failed")
+    results = []
+    for metrics, prompt in zip(metrics_list, prompts):
+        analysis = analyses.get(metrics.get('repo_name', 'Unknown'))
+        if analysis is not None:
+            await _store_analysis(metrics, prompt, analysis)
+            results.append({"analysis": analysis})
+        else:
+            results.append(None)
+    return results
+
+def _batches(indexes, names, size):
+    # Answers are keyed by repo name, so a batch must not repeat one
+    batches = []
+    for index in indexes:
+        for batch in batches:
+            if len(batch) < size and all(names[other] != names[index] for other in batch):
+                batch.append(index)
+                break
+        else:
+            batches.append([index])
+    return [batch for batch in batches if len(batch) > 1]
+
+async def generate_repo_analyses(metrics_list, batch_size=OPENAI_BATCH_SIZE):
+    """generate_repo_analysis for several repos, up to batch_size per completion.
+
+    Repos a batch fails to answer, and any left on their own, fall back to
+    one completion each.
+    """
+    prompts = [build_analysis_prompt(metrics) for metrics in metrics_list]
+    stored = await asyncio.gather(*(_stored_analysis(metrics, prompt) for metrics, prompt in zip(metrics_list, prompts)))
+    results = [{"analysis": analysis} if analysis is not None else None for analysis in stored]
+
+    pending = [index for index, result in enumerate(results) if result is None]
+    if batch_size > 1 and len(pending) > 1:
+        names = [metrics.get('repo_name', 'Unknown') for metrics in metrics_list]
+        batches = _batches(pending, names, batch_size)
+        batch_results = await asyncio.gather(*(
+            _analyze_batch([metrics_list[index] for index in batch], [prompts[index] for index in batch])
+            for batch in batches
+        ))
+        for batch, analyses in zip(batches, batch_results):
+            for index, result in zip(batch, analyses):
+                results[index] = result
+
+    missing = [index for index, result in enumerate(results) if result is None]
+    if missing:
+        singles = await asyncio.gather(*(generate_repo_analysis(metrics_list[index]) for index in missing))
+        for index, result in zip(missing, singles):
+            results[index] = result
+    return results
+
+async def stream_repo_analysis(metrics):
+    """Yield the analysis text for metrics in chunks as the model generates it.
+
+    A failed completion raises rather than yielding its error as analysis text.
+    """
+    prompt = build_analysis_prompt(metrics)
+
+    # Another worker may already have completed this prompt
+    cached = await _stored_analysis(metrics, prompt)
+    if cached is not None:
+        yield cached
+        return
+
+    chunks = []
+    async with _openai_slot():
+        started = time.perf_counter()
+        stream = await _request_client().chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=_analysis_messages(prompt),
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        async for chunk in stream:
+            # The final chunk carries usage and no choices
+            _record_usage(getattr(chunk, "usage", None))
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                chunks.append(delta)
+                yield delta
+        OPENAI_LATENCY.observe(time.perf_counter() - started, mode="stream")
+
+    await _store_analysis(metrics, prompt, "".join(chunks).strip())
 
 async def chain_of_thought_analysis(repo_data):
     try:
-        metrics = calculate_key_metrics(repo_data)
-        overall_score = compute_overall_score(metrics)
+        with SCORING_TIME.time(path="scalar"):
+            metrics = calculate_key_metrics(repo_data)
+            overall_score = compute_overall_score(metrics)
         analysis_result = await generate_repo_analysis(metrics)
         analysis_result['overall_score'] = overall_score
         return {**metrics, **analysis_result}
@@ -204,5 +526,22 @@ async def chain_of_thought_analysis(repo_data):
         return {
             **default_metrics,
             "analysis": f"An error occurred during analysis: {str(e)}",
-            "overall_score": 0
+            "overall_score": 0,
+            "degraded": True
         }
+
+async def chain_of_thought_analyses(repos):
+    """chain_of_thought_analysis for several repos, sharing batched completions."""
+    try:
+        with SCORING_TIME.time(path="scalar"):
+            all_metrics = [calculate_key_metrics(repo) for repo in repos]
+            overall_scores = [compute_overall_score(metrics) for metrics in all_metrics]
+        analysis_results = await generate_repo_analyses(all_metrics)
+        return [
+            {**metrics, **analysis_result, 'overall_score': overall_score}
+            for metrics, analysis_result, overall_score in zip(all_metrics, analysis_results, overall_scores)
+        ]
+    except Exception as e:
+        # One repo at a time, each with its own error handling and defaults
+        logger.exception(f"Batched analysis failed, analyzing repos one by one: {str(e)}")
+        return list(await asyncio.gather(*(chain_of_thought_analysis(repo) for repo in repos)))
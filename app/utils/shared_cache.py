@@ -0,0 +1,439 @@
+# app/utils/shared_cache.py
+#
+# Cache and coordination shared between uvicorn workers and nodes. Values are
+# stored as JSON bytes with a TTL in one of three backends, selected by
+# SHARED_CACHE_URL:
+#
+#   memory://                 this process only (useful for local runs)
+#   sqlite:///path/to/file    every worker on one host
+#   redis://host:6379/0       the whole fleet (any RESP-speaking server)
+#
+# get_or_compute() adds a distributed single-flight on top: one caller takes
+# a lock for the key and computes, the rest wait for its result.
+
+import asyncio
+import logging
+import os
+import secrets
+import sqlite3
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse, unquote
+from app.utils import json_utils
+from app.utils.cache import SingleFlight
+from app.utils.metrics import Counter
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Empty disables the shared layer; every process then works on its own
+SHARED_CACHE_URL = os.getenv("SHARED_CACHE_URL", "")
+SHARED_CACHE_PREFIX = os.getenv("SHARED_CACHE_PREFIX", "ghra:")
+# How long a single-flight lock is held at most, and how often waiters poll
+SHARED_LOCK_TTL = float(os.getenv("SHARED_LOCK_TTL", "60"))
+SHARED_LOCK_POLL = float(os.getenv("SHARED_LOCK_POLL", "0.05"))
+
+SHARED_CACHE_LOOKUPS = Counter(
+    "shared_cache_lookups_total", "Shared cache lookups by result.", labelnames=("result",)
+)
+
+
+class CacheBackend:
+    """Byte store with expiry and set-if-absent, the primitives get_or_compute needs."""
+
+    async def get(self, key):
+        """Return (value, seconds_left) or (None, 0)."""
+        raise NotImplementedError
+
+    async def set(self, key, value, ttl, only_if_absent=False):
+        """Store value for ttl seconds; returns False if only_if_absent and key exists."""
+        raise NotImplementedError
+
+    async def delete(self, key, only_if_value=None):
+        raise NotImplementedError
+
+    async def delete_prefix(self, prefix):
+        """Delete every key starting with prefix; returns how many were deleted."""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class MemoryBackend(CacheBackend):
+    def __init__(self):
+        self._entries = {}  # key -> (expires_at, value)
+
+    def _live(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= time.time():
+            del self._entries[key]
+            return None
+        return entry
+
+    async def get(self, key):
+        entry = self._live(key)
+        if entry is None:
+            return None, 0
+        return entry[1], entry[0] - time.time()
+
+    async def set(self, key, value, ttl, only_if_absent=False):
+        if only_if_absent and self._live(key) is not None:
+            return False
+        self._entries[key] = (time.time() + ttl, value)
+        return True
+
+    async def delete(self, key, only_if_value=None):
+        entry = self._live(key)
+        if entry is not None and (only_if_value is None or entry[1] == only_if_value):
+            del self._entries[key]
+
+    async def delete_prefix(self, prefix):
+        keys = [key for key in self._entries if key.startswith(prefix)]
+        for key in keys:
+            del self._entries[key]
+        return len(keys)
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shared_cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS shared_cache_expires_at ON shared_cache (expires_at);
+"""
+
+
+class SQLiteBackend(CacheBackend):
+    """Shared by every process on a host through one WAL-mode database file."""
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(SQLITE_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def _get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, expires_at FROM shared_cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+        if row is None:
+            return None, 0
+        return bytes(row[0]), row[1] - now
+
+    def _set(self, key, value, ttl, only_if_absent):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if only_if_absent:
+                row = conn.execute(
+                    "SELECT 1 FROM shared_cache WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+                if row is not None:
+                    conn.execute("ROLLBACK")
+                    return False
+            conn.execute(
+                "INSERT OR REPLACE INTO shared_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ttl),
+            )
+            conn.execute("DELETE FROM shared_cache WHERE expires_at <= ?", (now,))
+            conn.execute("COMMIT")
+        return True
+
+    def _delete(self, key, only_if_value):
+        with self._connect() as conn:
+            if only_if_value is None:
+                conn.execute("DELETE FROM shared_cache WHERE key = ?", (key,))
+            else:
+                conn.execute("DELETE FROM shared_cache WHERE key = ? AND value = ?", (key, only_if_value))
+
+    def _delete_prefix(self, prefix):
+        with self._connect() as conn:
+            return conn.execute(
+                "DELETE FROM shared_cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+            ).rowcount
+
+    async def get(self, key):
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key, value, ttl, only_if_absent=False):
+        return await asyncio.to_thread(self._set, key, value, ttl, only_if_absent)
+
+    async def delete(self, key, only_if_value=None):
+        await asyncio.to_thread(self._delete, key, only_if_value)
+
+    async def delete_prefix(self, prefix):
+        return await asyncio.to_thread(self._delete_prefix, prefix)
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisBackend(CacheBackend):
+    """Minimal RESP2 client over asyncio streams with a small connection pool.
+
+    Only GET, PTTL, SET (PX/NX), DEL and SCAN are used, so any
+    Redis-compatible server works, including the local stand-in in
+    benchmarks/resp_server.py.
+    """
+
+    def __init__(self, host="127.0.0.1", port=6379, db=0, password=None, pool_size=8):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.pool_size = pool_size
+        self._idle = []
+        self._slots = None
+
+    @staticmethod
+    def _encode(*args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if isinstance(arg, str):
+                arg = arg.encode("utf-8")
+            elif not isinstance(arg, bytes):
+                arg = str(arg).encode("ascii")
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    @classmethod
+    async def _read_reply(cls, reader):
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode("utf-8")
+        if kind == b"-":
+            raise RedisError(payload.decode("utf-8"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = await reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(payload)
+            if count < 0:
+                return None
+            return [await cls._read_reply(reader) for _ in range(count)]
+        raise RedisError(f"Unexpected reply from Redis: {line!r}")
+
+    async def _open(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        connection = (reader, writer)
+        if self.password:
+            await self._call(connection, "AUTH", self.password)
+        if self.db:
+            await self._call(connection, "SELECT", self.db)
+        return connection
+
+    async def _call(self, connection, *args):
+        reader, writer = connection
+        writer.write(self._encode(*args))
+        await writer.drain()
+        return await self._read_reply(reader)
+
+    async def execute(self, *args):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else await self._open()
+            try:
+                reply = await self._call(connection, *args)
+            except RedisError:
+                # Server-side errors leave the connection usable
+                self._idle.append(connection)
+                raise
+            except BaseException:
+                connection[1].close()
+                raise
+            self._idle.append(connection)
+            return reply
+
+    async def get(self, key):
+        value = await self.execute("GET", key)
+        if value is None:
+            return None, 0
+        ttl_ms = await self.execute("PTTL", key)
+        return value, max(ttl_ms, 0) / 1000
+
+    async def set(self, key, value, ttl, only_if_absent=False):
+        args = ["SET", key, value, "PX", max(int(ttl * 1000), 1)]
+        if only_if_absent:
+            args.append("NX")
+        return await self.execute(*args) is not None
+
+    async def delete(self, key, only_if_value=None):
+        # Without scripting, the compare and delete are two round trips; a
+        # lock expiring in between only costs one duplicated computation
+        if only_if_value is not None and await self.execute("GET", key) != only_if_value:
+            return
+        await self.execute("DEL", key)
+
+    async def delete_prefix(self, prefix):
+        # SCAN MATCH takes a glob, so escape the prefix's own glob characters
+        pattern = "".join("\\" + char if char in "*?[]\\" else char for char in prefix) + "*"
+        deleted, cursor = 0, b"0"
+        while True:
+            cursor, keys = await self.execute("SCAN", cursor, "MATCH", pattern, "COUNT", 500)
+            if keys:
+                deleted += await self.execute("DEL", *keys)
+            if cursor == b"0":
+                return deleted
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+        # Connections and the semaphore belong to the loop that made them
+        self._slots = None
+
+
+def create_backend(url):
+    """Build a CacheBackend from a SHARED_CACHE_URL, or None when it is empty."""
+    if not url:
+        return None
+    parsed = urlparse(url)
+    if parsed.scheme == "memory":
+        return MemoryBackend()
+    if parsed.scheme == "sqlite":
+        return SQLiteBackend(unquote(parsed.path) or "shared_cache.sqlite3")
+    if parsed.scheme == "redis":
+        db = parsed.path.lstrip("/")
+        return RedisBackend(
+            host=parsed.hostname or "127.0.0.1",
+            port=parsed.port or 6379,
+            db=int(db) if db else 0,
+            password=unquote(parsed.password) if parsed.password else None,
+        )
+    raise ValueError(f"Unsupported SHARED_CACHE_URL scheme: {parsed.scheme}")
+
+
+class SharedCache:
+    """JSON values with TTLs in a CacheBackend, plus distributed single-flight.
+
+    With no backend every call just computes, so callers don't need to check
+    whether sharing is configured.
+    """
+
+    def __init__(self, backend, prefix=SHARED_CACHE_PREFIX, lock_ttl=SHARED_LOCK_TTL, lock_poll=SHARED_LOCK_POLL):
+        self.backend = backend
+        self.prefix = prefix
+        self.lock_ttl = lock_ttl
+        self.lock_poll = lock_poll
+        self._local = SingleFlight()
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    async def get(self, key):
+        """Return (value, seconds_left), or (None, 0) on a miss or backend error."""
+        if self.backend is None:
+            return None, 0
+        try:
+            data, ttl = await self.backend.get(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Shared cache get failed for {key}: {str(e)}")
+            return None, 0
+        if data is None:
+            return None, 0
+        return json_utils.loads(data), ttl
+
+    async def set(self, key, value, ttl):
+        if self.backend is None:
+            return
+        try:
+            await self.backend.set(self.prefix + key, json_utils.dumps(value), ttl)
+        except Exception as e:
+            logger.warning(f"Shared cache set failed for {key}: {str(e)}")
+
+    async def delete(self, key):
+        if self.backend is None:
+            return
+        try:
+            await self.backend.delete(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Shared cache delete failed for {key}: {str(e)}")
+
+    async def delete_prefix(self, prefix):
+        """Delete every key starting with prefix; returns how many were deleted."""
+        if self.backend is None:
+            return 0
+        try:
+            return await self.backend.delete_prefix(self.prefix + prefix)
+        except Exception as e:
+            logger.warning(f"Shared cache delete failed for {prefix}*: {str(e)}")
+            return 0
+
+    async def get_or_compute(self, key, compute, ttl, min_ttl=0):
+        """Return (value, seconds_left) for key, computing it at most once across the fleet.
+
+        Entries with less than min_ttl seconds left are recomputed. Backend
+        failures fall back to computing locally rather than failing the caller.
+        """
+        if self.backend is None:
+            return await compute(), ttl
+        return await self._local.do(key, lambda: self._get_or_compute(key, compute, ttl, min_ttl))
+
+    async def _get_or_compute(self, key, compute, ttl, min_ttl):
+        lock_key = f"{self.prefix}lock:{key}"
+        token = secrets.token_hex(8).encode("ascii")
+        deadline = time.monotonic() + self.lock_ttl
+        while True:
+            value, left = await self.get(key)
+            if value is not None and left > min_ttl:
+                SHARED_CACHE_LOOKUPS.inc(result="hit")
+                return value, left
+
+            try:
+                locked = await self.backend.set(lock_key, token, self.lock_ttl, only_if_absent=True)
+            except Exception as e:
+                logger.warning(f"Shared cache lock failed for {key}: {str(e)}")
+                locked = None
+
+            if locked is None or time.monotonic() >= deadline:
+                # Backend unavailable, or the lock holder is taking too long
+                SHARED_CACHE_LOOKUPS.inc(result="fallback")
+                return await compute(), ttl
+
+            if locked:
+                break
+
+            # Another worker is computing this key; wait for its result
+            await asyncio.sleep(self.lock_poll)
+
+        SHARED_CACHE_LOOKUPS.inc(result="miss")
+        try:
+            value = await compute()
+            await self.set(key, value, ttl)
+            return value, ttl
+        finally:
+            try:
+                await self.backend.delete(lock_key, only_if_value=token)
+            except Exception as e:
+                logger.warning(f"Shared cache unlock failed for {key}: {str(e)}")
+
+    async def close(self):
+        if self.backend is not None:
+            await self.backend.close()
+
+
+# Shared by the routers and the analysis pipeline
+SHARED_CACHE = SharedCache(create_backend(SHARED_CACHE_URL))
@@ -0,0 +1,65 @@
+# app/utils/warmup.py
+#
+# Optional background pre-warming for scale-to-zero deployments. Nothing
+# heavy happens at import or startup: the OpenAI SDK is imported, and the
+# GitHub and OpenAI clients (each loading a CA bundle) are built, on first
+# use. With PREWARM_CONNECTIONS enabled that work, plus opening a pooled
+# connection to each API, starts in the background as soon as the app has
+# booted, so it overlaps the wait for the first request instead of adding
+# to it.
+
+import asyncio
+import logging
+import os
+import time
+from app.utils import github_client, repository_analysis
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+PREWARM_CONNECTIONS = os.getenv("PREWARM_CONNECTIONS", "false").lower() in ("1", "true", "yes")
+
+_task = None
+
+
+async def _warm_github():
+    await github_client.start_client()
+    # /rate_limit is free and doesn't count against any rate limit
+    response = await github_client.rest_get("/rate_limit")
+    logger.info(f"Pre-warmed GitHub connection ({response.status_code})")
+
+
+async def _warm_openai():
+    client = await repository_analysis.start_openai_client()
+    try:
+        await client.with_options(max_retries=0).models.list()
+    except Exception as e:
+        # Any response (even a 401) leaves a pooled connection behind
+        logger.debug("OpenAI pre-warm request failed: %s", e)
+    logger.info("Pre-warmed OpenAI client")
+
+
+async def prewarm():
+    started = time.perf_counter()
+    results = await asyncio.gather(_warm_github(), _warm_openai(), return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logger.warning(f"Pre-warm step failed: {str(result)}")
+    logger.info(f"Pre-warm finished in {time.perf_counter() - started:.2f}s")
+
+
+def start(enabled=PREWARM_CONNECTIONS):
+    global _task
+    if enabled and _task is None:
+        _task = asyncio.create_task(prewarm())
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -0,0 +1,85 @@
+# benchmarks/bench_graphql_client.py
+#
+# Compares a fresh httpx.AsyncClient per call (the old graphql_query
+# behaviour) against the shared pooled client under concurrent load.
+#
+#   python -m benchmarks.bench_graphql_client --requests 500 --concurrency 50
+#
+# The stub speaks plain HTTP/1.1, so this measures connection reuse;
+# HTTP/2 multiplexing only kicks in against the real TLS endpoint.
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from app.utils import github_client
+from app.utils.github_scheduler import SCHEDULER
+from benchmarks.stub_server import StubServer, json_handler, percentile
+
+STUB_PAYLOAD = {"data": {"user": {"login": "octocat", "name": "The Octocat"}}}
+
+
+async def _per_call_client_query(query, variables):
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        response = await client.post(
+            github_client.GITHUB_GRAPHQL_URL,
+            json={"query": query, "variables": variables},
+            headers=github_client.github_headers(),
+        )
+        response.raise_for_status()
+        return response.json()
+
+
+async def _run(query_func, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await query_func("query { viewer { login } }", {})
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    return latencies, elapsed
+
+
+def _report(label, latencies, elapsed, server):
+    print(
+        f"{label:<12} req/s={len(latencies) / elapsed:8.1f} "
+        f"p50={percentile(latencies, 50) * 1000:7.2f}ms "
+        f"p99={percentile(latencies, 99) * 1000:7.2f}ms "
+        f"connections={server.connections}"
+    )
+
+
+async def main(total, concurrency, latency):
+    async with StubServer(json_handler(STUB_PAYLOAD), latency=latency) as server:
+        github_client.GITHUB_GRAPHQL_URL = f"{server.url}/graphql"
+        # The scheduler in graphql_query would cap concurrency for the pooled
+        # run only, so lift it to compare the transports like for like.
+        SCHEDULER.max_concurrency = concurrency
+
+        latencies, elapsed = await _run(_per_call_client_query, total, concurrency)
+        _report("per-call", latencies, elapsed, server)
+
+        server.connections = 0
+        await github_client.start_client()
+        try:
+            latencies, elapsed = await _run(github_client.graphql_query, total, concurrency)
+            _report("pooled", latencies, elapsed, server)
+        finally:
+            await github_client.close_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.005, help="stub server latency in seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.latency))
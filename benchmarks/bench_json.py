@@ -0,0 +1,89 @@
+# benchmarks/bench_json.py
+#
+# Per-request CPU cost of decoding a GitHub payload and encoding the
+# /repos/commits response: stdlib json + pydantic models + FastAPI's
+# response_model serialization, versus the json_utils fast path.
+#
+#   python -m benchmarks.bench_json --size medium
+#   python -m benchmarks.bench_json --payload recorded.json
+
+import argparse
+import json
+import time
+from collections import defaultdict
+
+from fastapi.encoders import jsonable_encoder
+
+from app.models.models import LanguageYearUsage
+from app.utils import json_utils
+from benchmarks.fixtures import PAYLOAD_SIZES, payload_bytes
+
+
+def _usage(data):
+    usage = defaultdict(lambda: defaultdict(float))
+    for repo in data["data"]["user"]["repositories"]["nodes"]:
+        languages = [edge["node"]["name"] for edge in repo["languages"]["edges"]]
+        for commit in repo["defaultBranchRef"]["target"]["history"]["nodes"]:
+            changes = commit["additions"] + commit["deletions"]
+            for language in languages:
+                usage[language][int(commit["committedDate"][:4])] += changes / len(languages)
+    return usage
+
+
+def baseline(raw):
+    data = json.loads(raw)
+    usage_list = [
+        LanguageYearUsage(language=language, year=year, size=int(size))
+        for language, years in _usage(data).items()
+        for year, size in years.items()
+    ]
+    # What FastAPI does for response_model=List[LanguageYearUsage]
+    validated = [LanguageYearUsage.model_validate(item.model_dump()) for item in usage_list]
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def fast_path(raw):
+    data = json_utils.loads(raw)
+    usage_list = [
+        {"language": language, "year": year, "size": int(size)}
+        for language, years in _usage(data).items()
+        for year, size in years.items()
+    ]
+    return json_utils.dumps(usage_list)
+
+
+def _time(func, raw, iterations):
+    func(raw)
+    started = time.process_time()
+    for _ in range(iterations):
+        func(raw)
+    return (time.process_time() - started) / iterations
+
+
+def _time_decode(loads, raw, iterations):
+    started = time.process_time()
+    for _ in range(iterations):
+        loads(raw)
+    return (time.process_time() - started) / iterations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", choices=sorted(PAYLOAD_SIZES), default="medium")
+    parser.add_argument("--payload", help="path to a recorded GraphQL response to use instead")
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.payload:
+        with open(args.payload, "rb") as f:
+            raw = f.read()
+    else:
+        raw = payload_bytes(args.size)
+
+    print(f"payload: {len(raw) / 1024:.0f} KiB, fast decoder: {'orjson' if json_utils.orjson else 'stdlib json'}")
+    decode_before = _time_decode(json.loads, raw, args.iterations)
+    decode_after = _time_decode(json_utils.loads, raw, args.iterations)
+    print(f"decode     stdlib={decode_before * 1000:8.2f}ms  fast={decode_after * 1000:8.2f}ms")
+    before = _time(baseline, raw, args.iterations)
+    after = _time(fast_path, raw, args.iterations)
+    print(f"request    before={before * 1000:8.2f}ms  after={after * 1000:8.2f}ms  saving={(1 - after / before) * 100:5.1f}%")
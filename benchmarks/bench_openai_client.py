@@ -0,0 +1,101 @@
+# benchmarks/bench_openai_client.py
+#
+# Compares the old analysis path (a fresh synchronous OpenAI client per
+# call, run through asyncio.to_thread) against the shared AsyncOpenAI
+# client, using a local mock of the chat completions endpoint.
+#
+#   python -m benchmarks.bench_openai_client --analyses 50 --latency 0.2
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+
+from benchmarks.stub_server import StubServer, percentile
+
+COMPLETION = {
+    "id": "chatcmpl-bench",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4o-mini",
+    "choices": [
+        {
+            "index": 0,
+            "message": {"role": "assistant", "content": "A healthy, well maintained repository."},
+            "finish_reason": "stop",
+        }
+    ],
+    "usage": {"prompt_tokens": 150, "completion_tokens": 60, "total_tokens": 210},
+}
+
+
+def completion_handler(method, path, headers, body):
+    return 200, {}, json.dumps(COMPLETION).encode()
+
+
+def _per_call_client_sync(prompt):
+    from openai import OpenAI
+
+    client = OpenAI(api_key="bench")
+    response = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": prompt}],
+    )
+    return {"analysis": response.choices[0].message.content.strip()}
+
+
+async def _per_call_client(prompt):
+    return await asyncio.to_thread(_per_call_client_sync, prompt)
+
+
+async def _run(analysis_func, total):
+    latencies = []
+    peak_threads = threading.active_count()
+
+    async def one(index):
+        nonlocal peak_threads
+        started = time.perf_counter()
+        await analysis_func(f"Repository: bench-{index}")
+        latencies.append(time.perf_counter() - started)
+        peak_threads = max(peak_threads, threading.active_count())
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(total)))
+    return latencies, time.perf_counter() - started, peak_threads
+
+
+def _report(label, latencies, elapsed, peak_threads, server):
+    print(
+        f"{label:<12} analyses/s={len(latencies) / elapsed:7.1f} "
+        f"p50={percentile(latencies, 50) * 1000:8.1f}ms "
+        f"p99={percentile(latencies, 99) * 1000:8.1f}ms "
+        f"threads={peak_threads} connections={server.connections}"
+    )
+
+
+async def main(total, latency):
+    async with StubServer(completion_handler, latency=latency) as server:
+        os.environ["OPENAI_BASE_URL"] = f"{server.url}/v1"
+        from app.utils import repository_analysis
+
+        repository_analysis.OPENAI_API_KEY = "bench"
+
+        latencies, elapsed, peak_threads = await _run(_per_call_client, total)
+        _report("per-call", latencies, elapsed, peak_threads, server)
+
+        server.connections = 0
+        try:
+            latencies, elapsed, peak_threads = await _run(repository_analysis._generate_repo_analysis, total)
+            _report("shared", latencies, elapsed, peak_threads, server)
+        finally:
+            await repository_analysis.close_openai_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--analyses", type=int, default=50, help="concurrent analyses")
+    parser.add_argument("--latency", type=float, default=0.2, help="mock completion latency in seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.analyses, args.latency))
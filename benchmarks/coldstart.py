@@ -0,0 +1,196 @@
+# benchmarks/coldstart.py
+#
+# Cold-start benchmark for scale-to-zero deployments. Every run starts a
+# fresh interpreter, as a new instance would, and times importing app.main,
+# the app lifespan startup, and the first /user and /repos/analyze requests
+# against local GitHub and OpenAI stubs. A separate `-X importtime` run
+# breaks the import down by top-level package.
+#
+#   python -m benchmarks.coldstart --runs 5
+#   python -m benchmarks.coldstart --prewarm --idle 0.5
+#   python -m benchmarks.coldstart --save-baseline cold.json
+#   python -m benchmarks.coldstart --baseline cold.json --threshold 0.2
+#
+# --idle waits between startup and the first request, which is when
+# PREWARM_CONNECTIONS (--prewarm) does its work.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+STAGES = ("import_ms", "startup_ms", "first_profile_ms", "first_analyze_ms", "total_ms")
+LABELS = {
+    "import_ms": "import app.main",
+    "startup_ms": "lifespan startup",
+    "first_profile_ms": "first /user",
+    "first_analyze_ms": "first /repos/analyze",
+    "total_ms": "total",
+}
+
+
+def child(args):
+    """Runs in the fresh interpreter; prints one JSON line of stage timings."""
+    started = time.perf_counter()
+    from app.main import app
+    imported = time.perf_counter()
+
+    # Everything the benchmark itself needs is imported only after the app
+    import asyncio
+    import httpx
+    from benchmarks.fake_services import FakeGitHub, FakeOpenAI
+    from benchmarks.loadtest import StubThread
+    from app.utils import github_client
+
+    async def first_requests(stubs):
+        github_client.GITHUB_GRAPHQL_URL = f"{stubs.github.url}/graphql"
+        github_client.GITHUB_API_URL = stubs.github.url
+        os.environ["OPENAI_BASE_URL"] = f"{stubs.openai.url}/v1"
+
+        timings = {}
+        lifespan_started = time.perf_counter()
+        async with app.router.lifespan_context(app):
+            timings["startup_ms"] = (time.perf_counter() - lifespan_started) * 1000
+            await asyncio.sleep(args.idle)
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=None) as client:
+                for stage, path in (("first_profile_ms", "/user/cold"), ("first_analyze_ms", "/repos/analyze/cold")):
+                    request_started = time.perf_counter()
+                    response = await client.get(path)
+                    timings[stage] = (time.perf_counter() - request_started) * 1000
+                    if response.status_code != 200:
+                        raise RuntimeError(f"{path} returned {response.status_code}: {response.text[:200]}")
+        return timings
+
+    with StubThread(FakeGitHub(size="small"), FakeOpenAI(), args.github_latency, args.openai_latency) as stubs:
+        timings = asyncio.run(first_requests(stubs))
+
+    timings["import_ms"] = (imported - started) * 1000
+    timings["total_ms"] = timings["import_ms"] + timings["startup_ms"] + timings["first_profile_ms"] + timings["first_analyze_ms"]
+    print(json.dumps(timings))
+
+
+def _child_env(args, state_dir):
+    env = dict(os.environ)
+    env.update({
+        "COMMIT_STORE_PATH": os.path.join(state_dir, "commit_store.sqlite3"),
+        "ANALYSIS_CACHE_PATH": os.path.join(state_dir, "analysis_cache.sqlite3"),
+        "OPENAI_API_KEY": env.get("OPENAI_API_KEY", "bench"),
+        "GITHUB_TOKEN": env.get("GITHUB_TOKEN", "bench"),
+        "SHARED_CACHE_URL": "",
+        "PREWARM_CONNECTIONS": "true" if args.prewarm else "false",
+    })
+    return env
+
+
+def run_once(args):
+    # Fresh stores each run, so no run benefits from an earlier one's cache
+    with tempfile.TemporaryDirectory() as state_dir:
+        command = [
+            sys.executable, "-m", "benchmarks.coldstart", "--child",
+            "--idle", str(args.idle),
+            "--github-latency", str(args.github_latency),
+            "--openai-latency", str(args.openai_latency),
+        ]
+        output = subprocess.run(
+            command, env=_child_env(args, state_dir), capture_output=True, text=True, check=True
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def import_breakdown(args, top=12):
+    """Self import time per top-level package from `python -X importtime`."""
+    with tempfile.TemporaryDirectory() as state_dir:
+        stderr = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import app.main"],
+            env=_child_env(args, state_dir), capture_output=True, text=True, check=True,
+        ).stderr
+
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(self_us)
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+    return {package: self_us / 1000 for package, self_us in ranked[:top]}, sum(packages.values()) / 1000
+
+
+def summarize(runs):
+    return {
+        stage: {
+            "median": statistics.median(run[stage] for run in runs),
+            "min": min(run[stage] for run in runs),
+            "max": max(run[stage] for run in runs),
+        }
+        for stage in STAGES
+    }
+
+
+def _print_report(summary, breakdown, import_total):
+    print(f"{'stage':<22} {'median ms':>10} {'min ms':>9} {'max ms':>9}")
+    for stage in STAGES:
+        result = summary[stage]
+        print(f"{LABELS[stage]:<22} {result['median']:10.1f} {result['min']:9.1f} {result['max']:9.1f}")
+
+    print(f"\nImport self time by package (-X importtime, {import_total:.1f} ms total)")
+    for package, self_ms in breakdown.items():
+        print(f"  {package:<20} {self_ms:9.1f} ms")
+
+
+def compare_to_baseline(summary, baseline, threshold):
+    """Return a list of human-readable regressions in median stage times."""
+    regressions = []
+    for stage in STAGES:
+        previous = baseline.get(stage)
+        if previous is None:
+            continue
+        if summary[stage]["median"] > previous["median"] * (1 + threshold):
+            regressions.append(f"{LABELS[stage]}: {previous['median']:.1f}ms -> {summary[stage]['median']:.1f}ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import and first-request benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to start")
+    parser.add_argument("--prewarm", action="store_true", help="enable PREWARM_CONNECTIONS")
+    parser.add_argument("--idle", type=float, default=0.0, help="seconds between startup and the first request")
+    parser.add_argument("--github-latency", type=float, default=0.02, help="seconds added to each GitHub call")
+    parser.add_argument("--openai-latency", type=float, default=0.1, help="seconds added to each OpenAI call")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--save-baseline", help="write this run's results as JSON")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    runs = [run_once(args) for _ in range(args.runs)]
+    summary = summarize(runs)
+    breakdown, import_total = import_breakdown(args)
+    _print_report(summary, breakdown, import_total)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as output:
+            json.dump(summary, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare_to_baseline(summary, json.load(baseline_file), args.threshold)
+        if regressions:
+            print(f"\nRegressions beyond {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
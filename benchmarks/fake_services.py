@@ -0,0 +1,195 @@
+# benchmarks/fake_services.py
+#
+# StubServer handlers that replay fixture data as GitHub's GraphQL API and
+# the OpenAI chat completions API. FakeGitHub answers every query the app
+# sends (profile, repo metrics, commit history pages, head probes and the
+# aliased batch query) from one payload per login, honouring first/after
+# pagination and the since filter so the app walks the same pages it
+# would against api.github.com. REST GETs (the change-detection probes)
+# get an ETag per login and a 304 when If-None-Match still matches.
+
+import json
+import re
+
+from benchmarks.fixtures import RATE_LIMIT, PAYLOAD_SIZES, make_user_payload
+
+_REPOS_FIRST = re.compile(r"repositories\(\s*first:\s*(\d+)")
+_HISTORY_FIRST = re.compile(r"history\(first:\s*(\d+)")
+_ALIAS = re.compile(r"^u\d+$")
+
+
+class FakeGitHub:
+    """GraphQL handler serving a fixture payload for any login.
+
+    payload_for(login) returns a make_user_payload()-shaped document; by
+    default each login gets a generated payload of the given size, seeded
+    by the order logins are first seen. Pass a recorded response instead
+    to replay it for every login.
+    """
+
+    def __init__(self, size="medium", recorded=None):
+        self.size = size
+        self.recorded = recorded
+        self.calls = 0
+        self.rest_calls = 0
+        self.not_modified = 0
+        self._users = {}
+        self._responses = {}
+        self._versions = {}
+
+    def touch(self, login):
+        """Mark a login as changed, so its next conditional probes return 200."""
+        self._versions[login.lower()] = self._versions.get(login.lower(), 0) + 1
+
+    def _rest(self, path, headers):
+        self.rest_calls += 1
+        login = path.split("/")[2].split("?")[0].lower()
+        etag = f'W/"{self._versions.get(login, 0)}-{abs(hash(path))}"'
+        if headers.get("if-none-match") == etag:
+            self.not_modified += 1
+            return 304, {"etag": etag}, b""
+        return 200, {"etag": etag}, b"[]"
+
+    def payload_for(self, login):
+        key = login.lower()
+        user = self._users.get(key)
+        if user is None:
+            if self.recorded is not None:
+                payload = self.recorded
+            else:
+                payload = make_user_payload(login=login, seed=len(self._users), **PAYLOAD_SIZES[self.size])
+            user = self._users[key] = payload["data"]["user"]
+        return user
+
+    @staticmethod
+    def _page(nodes, first, after):
+        start = int(after) if after else 0
+        end = start + first
+        return {
+            "pageInfo": {"hasNextPage": end < len(nodes), "endCursor": str(end)},
+            "nodes": nodes[start:end],
+        }
+
+    def _history(self, repo, text, after=None, since=None):
+        target = (repo.get("defaultBranchRef") or {}).get("target") or {}
+        commits = target.get("history", {}).get("nodes", [])
+        if since:
+            commits = [commit for commit in commits if commit["committedDate"] >= since]
+        match = _HISTORY_FIRST.search(text)
+        return self._page(commits, int(match.group(1)) if match else 100, after)
+
+    def _repo_node(self, repo, login, text, variables):
+        node = {key: value for key, value in repo.items() if key != "defaultBranchRef"}
+        node["owner"] = {"login": login}
+        if "languages(" not in text:
+            node.pop("languages", None)
+
+        target = (repo.get("defaultBranchRef") or {}).get("target")
+        if target and "defaultBranchRef" in text:
+            selected = {"oid": target.get("oid"), "committedDate": target.get("committedDate")}
+            if "history(" in text:
+                selected["history"] = self._history(repo, text, since=variables.get("since"))
+            node["defaultBranchRef"] = {"target": selected}
+        return node
+
+    def _user(self, login, text, variables):
+        user = self.payload_for(login)
+        result = {key: value for key, value in user.items() if key != "repositories"}
+        match = _REPOS_FIRST.search(text)
+        if match:
+            repos = [self._repo_node(repo, login, text, variables) for repo in user["repositories"]["nodes"]]
+            if "field: STARGAZERS, direction: DESC" in text:
+                # Stable, like GitHub's ordering of equally starred repos
+                repos.sort(key=lambda repo: repo.get("stargazerCount", 0), reverse=True)
+            result["repositories"] = self._page(repos, int(match.group(1)), variables.get("after"))
+        return result
+
+    def _respond(self, text, variables):
+        if "repository(owner" in text:
+            user = self.payload_for(variables["owner"])
+            repo = next(repo for repo in user["repositories"]["nodes"] if repo["name"] == variables["name"])
+            history = self._history(repo, text, variables.get("after"), variables.get("since"))
+            data = {"repository": {"defaultBranchRef": {"target": {"history": history}}}}
+        elif "u0: user" in text:
+            data = {alias: self._user(login, text, variables) for alias, login in variables.items() if _ALIAS.match(alias)}
+        else:
+            data = {"user": self._user(variables["username"], text, variables)}
+        return json.dumps({"data": {"rateLimit": RATE_LIMIT, **data}}).encode()
+
+    def __call__(self, method, path, headers, body):
+        if method == "GET":
+            return self._rest(path, headers)
+        self.calls += 1
+        # Identical requests get identical bytes; encode each one only once
+        # so the stub's own CPU time stays out of the app's numbers
+        response = self._responses.get(body)
+        if response is None:
+            request = json.loads(body)
+            response = self._responses[body] = self._respond(request["query"], request.get("variables") or {})
+        return 200, {}, response
+
+
+ANALYSIS_TEXT = "Steady growth with healthy issue turnover; contributor engagement is strong for its size."
+
+
+class FakeOpenAI:
+    """Chat completions handler returning a fixed analysis, streamed or not.
+
+    Requests with a json_schema response_format (batched analyses) get a
+    JSON object with the fixed analysis for every required key.
+    """
+
+    def __init__(self, text=ANALYSIS_TEXT, chunk_words=4):
+        self.text = text
+        self.chunk_words = chunk_words
+        self.calls = 0
+
+    def _content(self, request):
+        schema = ((request.get("response_format") or {}).get("json_schema") or {}).get("schema")
+        if schema is None:
+            return self.text
+        return json.dumps({name: self.text for name in schema.get("required", [])})
+
+    def _completion(self, request):
+        return json.dumps({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4o-mini",
+            "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": self._content(request)}, "finish_reason": "stop"}
+            ],
+            "usage": {"prompt_tokens": 150, "completion_tokens": 60, "total_tokens": 210},
+        }).encode()
+
+    def _stream(self):
+        words = self.text.split(" ")
+        events = []
+        for index in range(0, len(words), self.chunk_words):
+            delta = " ".join(words[index:index + self.chunk_words]) + " "
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": "gpt-4o-mini",
+                "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}],
+            }
+            events.append(f"data: {json.dumps(chunk)}\n\n")
+        usage = {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "gpt-4o-mini",
+            "choices": [],
+            "usage": {"prompt_tokens": 150, "completion_tokens": 60, "total_tokens": 210},
+        }
+        events.append(f"data: {json.dumps(usage)}\n\n")
+        events.append("data: [DONE]\n\n")
+        return "".join(events).encode()
+
+    def __call__(self, method, path, headers, body):
+        self.calls += 1
+        request = json.loads(body)
+        if request.get("stream"):
+            return 200, {"content-type": "text/event-stream"}, self._stream()
+        return 200, {}, self._completion(request)
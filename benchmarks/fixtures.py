@@ -0,0 +1,95 @@
+# benchmarks/fixtures.py
+#
+# Deterministic GitHub GraphQL payloads shaped like real responses, for
+# benchmarks that need "recorded" data without hitting api.github.com.
+# A real recording can be substituted anywhere a payload is accepted.
+
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+LANGUAGES = ["Python", "TypeScript", "Go", "Rust", "JavaScript", "Shell", "HTML", "CSS", "C", "Dockerfile"]
+
+RATE_LIMIT = {"cost": 1, "remaining": 4999, "resetAt": "2030-01-01T00:00:00Z"}
+
+
+def make_commits(count, seed=0, start=datetime(2015, 1, 1, tzinfo=timezone.utc)):
+    """Newest-first commit nodes spread evenly from start until now."""
+    rng = random.Random(seed)
+    span = (datetime(2025, 1, 1, tzinfo=timezone.utc) - start).total_seconds()
+    commits = []
+    for index in range(count):
+        committed = start + timedelta(seconds=span * (count - index) / max(count, 1))
+        commits.append({
+            "oid": f"{seed:08x}{index:032x}",
+            "committedDate": committed.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "additions": rng.randint(0, 400),
+            "deletions": rng.randint(0, 200),
+        })
+    return commits
+
+
+def make_repo(index, login="octocat", commits=100, seed=0):
+    rng = random.Random(seed * 1000 + index)
+    languages = rng.sample(LANGUAGES, rng.randint(1, 5))
+    history = make_commits(commits, seed=seed * 1000 + index)
+    return {
+        "name": f"repo-{index}",
+        "stargazerCount": int(10 ** rng.uniform(0, 4.5)),
+        "forkCount": int(10 ** rng.uniform(0, 3)),
+        "openIssues": {"totalCount": rng.randint(0, 150)},
+        "closedIssues": {"totalCount": rng.randint(0, 600)},
+        "watchers": {"totalCount": rng.randint(0, 300)},
+        "description": f"Repository number {index}",
+        "primaryLanguage": {"name": languages[0]},
+        "languages": {
+            "edges": [{"size": rng.randint(1000, 500000), "node": {"name": name}} for name in languages]
+        },
+        "owner": {"login": login},
+        "isFork": False,
+        "updatedAt": "2024-06-01T00:00:00Z",
+        "defaultBranchRef": {
+            "target": {
+                "oid": history[0]["oid"] if history else None,
+                "committedDate": history[0]["committedDate"] if history else None,
+                "history": {
+                    "pageInfo": {"hasNextPage": False, "endCursor": None},
+                    "nodes": history,
+                },
+            }
+        },
+    }
+
+
+def make_user_payload(repos=20, commits_per_repo=100, login="octocat", seed=0):
+    """A full user(login:) response with profile, repositories and history."""
+    return {
+        "data": {
+            "rateLimit": RATE_LIMIT,
+            "user": {
+                "login": login,
+                "name": "The Octocat",
+                "avatarUrl": "https://avatars.githubusercontent.com/u/583231",
+                "bio": None,
+                "createdAt": "2011-01-25T18:44:36Z",
+                "followers": {"totalCount": 1000},
+                "following": {"totalCount": 9},
+                "repositories": {
+                    "pageInfo": {"hasNextPage": False, "endCursor": None},
+                    "nodes": [make_repo(index, login, commits_per_repo, seed) for index in range(repos)],
+                },
+            },
+        }
+    }
+
+
+# Named sizes used across the benchmarks
+PAYLOAD_SIZES = {
+    "small": {"repos": 3, "commits_per_repo": 10},
+    "medium": {"repos": 20, "commits_per_repo": 100},
+    "huge": {"repos": 100, "commits_per_repo": 1000},
+}
+
+
+def payload_bytes(size="medium"):
+    return json.dumps(make_user_payload(**PAYLOAD_SIZES[size])).encode()
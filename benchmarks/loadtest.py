@@ -0,0 +1,237 @@
+# benchmarks/loadtest.py
+#
+# Offline load test of the FastAPI app. GitHub and OpenAI are replaced by
+# local stubs (see fake_services.py) with configurable latency, and every
+# route is driven in-process at a fixed concurrency. Per endpoint it
+# reports req/s, p50/p95/p99 latency, peak RSS and the number of outbound
+# GitHub (GraphQL and REST) and OpenAI calls.
+#
+#   python -m benchmarks.loadtest --size medium --requests 200 --concurrency 20
+#   python -m benchmarks.loadtest --save-baseline bench.json
+#   python -m benchmarks.loadtest --baseline bench.json --threshold 0.15
+#
+# With --baseline, the run exits non-zero when any endpoint's req/s drops,
+# or its p95 latency or outbound call count grows, by more than --threshold.
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.fake_services import FakeGitHub, FakeOpenAI
+from benchmarks.fixtures import PAYLOAD_SIZES
+from benchmarks.stub_server import StubServer, percentile
+
+ENDPOINTS = {
+    "profile": ("GET", "/user/{username}"),
+    "analyze": ("GET", "/repos/analyze/{username}"),
+    "stream": ("GET", "/repos/analyze/{username}/stream"),
+    "commits": ("GET", "/repos/commits/{username}"),
+    "batch": ("POST", "/repos/batch"),
+}
+
+
+class StubThread:
+    """Runs the GitHub and OpenAI stubs on their own event loop thread.
+
+    Keeping them off the app's loop means stub work doesn't show up as
+    scheduling delay in the measured latencies.
+    """
+
+    def __init__(self, github, openai, github_latency, openai_latency):
+        self.loop = asyncio.new_event_loop()
+        self.github = StubServer(github, latency=github_latency)
+        self.openai = StubServer(openai, latency=openai_latency)
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        for server in (self.github, self.openai):
+            asyncio.run_coroutine_threadsafe(server.start(), self.loop).result()
+        return self
+
+    def __exit__(self, *exc_info):
+        for server in (self.github, self.openai):
+            asyncio.run_coroutine_threadsafe(server.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+
+
+def _current_rss_mb():
+    # Current resident set size from /proc where available, else the process peak
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+async def _sample_rss(state, interval=0.05):
+    while True:
+        state["peak_rss_mb"] = max(state["peak_rss_mb"], _current_rss_mb())
+        await asyncio.sleep(interval)
+
+
+async def run_endpoint(client, name, usernames, total, concurrency, github, openai):
+    method, path = ENDPOINTS[name]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(index):
+        nonlocal errors
+        username = usernames[index % len(usernames)]
+        async with semaphore:
+            started = time.perf_counter()
+            if method == "POST":
+                response = await client.post(path, json={"usernames": [username, f"{username}-2"]})
+            else:
+                response = await client.request(method, path.format(username=username))
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+
+    github_before, rest_before, openai_before = github.calls, github.rest_calls, openai.calls
+    state = {"peak_rss_mb": _current_rss_mb()}
+    sampler = asyncio.create_task(_sample_rss(state))
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(one(index) for index in range(total)))
+    finally:
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+
+    return {
+        "requests": total,
+        "errors": errors,
+        "req_per_s": total / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "peak_rss_mb": max(state["peak_rss_mb"], _current_rss_mb()),
+        "github_calls": github.calls - github_before,
+        "github_rest_calls": github.rest_calls - rest_before,
+        "openai_calls": openai.calls - openai_before,
+    }
+
+
+def _print_report(results):
+    print(
+        f"{'endpoint':<10} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+        f"{'rss MB':>8} {'github':>7} {'rest':>6} {'openai':>7} {'errors':>7}"
+    )
+    for name, result in results.items():
+        print(
+            f"{name:<10} {result['req_per_s']:9.1f} {result['p50_ms']:9.2f} {result['p95_ms']:9.2f} "
+            f"{result['p99_ms']:9.2f} {result['peak_rss_mb']:8.1f} {result['github_calls']:7d} "
+            f"{result.get('github_rest_calls', 0):6d} {result['openai_calls']:7d} {result['errors']:7d}"
+        )
+
+
+def compare_to_baseline(results, baseline, threshold):
+    """Return a list of human-readable regressions against a saved baseline."""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if result["req_per_s"] < previous["req_per_s"] * (1 - threshold):
+            regressions.append(f"{name}: req/s {previous['req_per_s']:.1f} -> {result['req_per_s']:.1f}")
+        if result["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {previous['p95_ms']:.2f}ms -> {result['p95_ms']:.2f}ms")
+        for field in ("github_calls", "openai_calls"):
+            if result[field] > previous[field] * (1 + threshold):
+                regressions.append(f"{name}: {field} {previous[field]} -> {result[field]}")
+    return regressions
+
+
+async def drive(args, stubs, github, openai):
+    # Imported here so the environment set up in main() is seen at import time
+    import httpx
+    from app.main import app
+    from app.routers import repo_analyzer
+    from app.utils import github_client
+
+    github_client.GITHUB_GRAPHQL_URL = f"{stubs.github.url}/graphql"
+    github_client.GITHUB_API_URL = stubs.github.url
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=None) as client:
+            for name in args.endpoints:
+                # Each endpoint starts from an empty in-process cache
+                repo_analyzer.USER_CACHE.clear()
+                usernames = [f"{args.user_prefix}{name}-{index}" for index in range(args.users)]
+                results[name] = await run_endpoint(
+                    client, name, usernames, args.requests, args.concurrency, github, openai
+                )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test against stubbed GitHub and OpenAI APIs")
+    parser.add_argument("--endpoints", nargs="+", choices=sorted(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument("--size", choices=sorted(PAYLOAD_SIZES), default="medium",
+                        help="generated fixture size per user")
+    parser.add_argument("--fixture", help="recorded user(login:) response to replay for every user")
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--users", type=int, default=20,
+                        help="distinct usernames per endpoint; fewer users means more cache hits")
+    parser.add_argument("--user-prefix", default="bench-")
+    parser.add_argument("--github-latency", type=float, default=0.05, help="seconds added to each GitHub call")
+    parser.add_argument("--openai-latency", type=float, default=0.3, help="seconds added to each OpenAI call")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--save-baseline", help="write this run's results as JSON")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed relative regression")
+    args = parser.parse_args()
+
+    recorded = None
+    if args.fixture:
+        with open(args.fixture) as fixture:
+            recorded = json.load(fixture)
+
+    github = FakeGitHub(size=args.size, recorded=recorded)
+    openai = FakeOpenAI()
+
+    with tempfile.TemporaryDirectory() as state_dir, StubThread(
+        github, openai, args.github_latency, args.openai_latency
+    ) as stubs:
+        # Fresh on-disk stores per run so every run starts equally cold
+        os.environ["COMMIT_STORE_PATH"] = os.path.join(state_dir, "commit_store.sqlite3")
+        os.environ["ANALYSIS_CACHE_PATH"] = os.path.join(state_dir, "analysis_cache.sqlite3")
+        os.environ["OPENAI_BASE_URL"] = f"{stubs.openai.url}/v1"
+        os.environ.setdefault("OPENAI_API_KEY", "bench")
+        os.environ.setdefault("GITHUB_TOKEN", "bench")
+        os.environ.setdefault("SHARED_CACHE_URL", "")
+
+        logging.disable(logging.WARNING)
+        results = asyncio.run(drive(args, stubs, github, openai))
+
+    _print_report(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as output:
+            json.dump(results, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare_to_baseline(results, json.load(baseline_file), args.threshold)
+        if regressions:
+            print(f"\nRegressions beyond {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
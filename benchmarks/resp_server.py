@@ -0,0 +1,176 @@
+# benchmarks/resp_server.py
+#
+# Tiny Redis-compatible (RESP2) server implementing just the commands the
+# shared cache uses: PING, AUTH, SELECT, GET, SET (EX/PX/NX), PTTL, DEL and
+# SCAN (MATCH, in a single pass).
+# Lets the redis:// backend be exercised locally without a Redis install:
+#
+#   python -m benchmarks.resp_server --port 6390
+#   SHARED_CACHE_URL=redis://127.0.0.1:6390/0 uvicorn app.main:app --workers 4
+
+import argparse
+import asyncio
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class RespServer:
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.commands = 0
+        self._data = {}  # key -> (expires_at or None, value)
+        self._server = None
+        self._writers = set()
+
+    @property
+    def url(self):
+        return f"redis://{self.host}:{self.port}/0"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    def _live(self, key):
+        entry = self._data.get(key)
+        if entry is not None and entry[0] is not None and entry[0] <= time.monotonic():
+            del self._data[key]
+            return None
+        return entry
+
+    @staticmethod
+    def _bulk(value):
+        if value is None:
+            return b"$-1\r\n"
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def _execute(self, args):
+        command = args[0].upper()
+        if command == b"PING":
+            return b"+PONG\r\n"
+        if command in (b"AUTH", b"SELECT"):
+            return b"+OK\r\n"
+        if command == b"GET":
+            entry = self._live(args[1])
+            return self._bulk(entry[1] if entry else None)
+        if command == b"SET":
+            key, value, expires_at, only_if_absent = args[1], args[2], None, False
+            options = [arg.upper() for arg in args[3:]]
+            for index, option in enumerate(options):
+                if option == b"PX":
+                    expires_at = time.monotonic() + int(args[4 + index]) / 1000
+                elif option == b"EX":
+                    expires_at = time.monotonic() + int(args[4 + index])
+                elif option == b"NX":
+                    only_if_absent = True
+            if only_if_absent and self._live(key) is not None:
+                return b"$-1\r\n"
+            self._data[key] = (expires_at, value)
+            return b"+OK\r\n"
+        if command == b"PTTL":
+            entry = self._live(args[1])
+            if entry is None:
+                return b":-2\r\n"
+            if entry[0] is None:
+                return b":-1\r\n"
+            return b":%d\r\n" % int((entry[0] - time.monotonic()) * 1000)
+        if command == b"DEL":
+            removed = 0
+            for key in args[1:]:
+                if self._live(key) is not None:
+                    del self._data[key]
+                    removed += 1
+            return b":%d\r\n" % removed
+        if command == b"SCAN":
+            # Every match in one reply, with the cursor already back at 0
+            options = [arg.upper() for arg in args[2:]]
+            pattern = args[3 + options.index(b"MATCH")] if b"MATCH" in options else b"*"
+            matcher = self._glob(pattern)
+            keys = [key for key in list(self._data) if self._live(key) is not None and matcher.fullmatch(key)]
+            return b"*2\r\n" + self._bulk(b"0") + b"*%d\r\n" % len(keys) + b"".join(self._bulk(key) for key in keys)
+        return b"-ERR unknown command '%s'\r\n" % command
+
+    @staticmethod
+    def _glob(pattern):
+        # Redis glob: * and ? wildcards, [...] classes, backslash escapes
+        parts, index = [], 0
+        while index < len(pattern):
+            char = pattern[index:index + 1]
+            if char == b"\\" and index + 1 < len(pattern):
+                index += 1
+                parts.append(re.escape(pattern[index:index + 1]))
+            elif char == b"*":
+                parts.append(b".*")
+            elif char == b"?":
+                parts.append(b".")
+            elif char == b"[":
+                end = pattern.find(b"]", index + 1)
+                if end < 0:
+                    parts.append(re.escape(char))
+                else:
+                    parts.append(pattern[index:end + 1])
+                    index = end
+            else:
+                parts.append(re.escape(char))
+            index += 1
+        return re.compile(b"".join(parts), re.DOTALL)
+
+    async def _read_command(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        count = int(line[1:-2])
+        args = []
+        for _ in range(count):
+            length = int((await reader.readline())[1:-2])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    async def _handle_connection(self, reader, writer):
+        self._writers.add(writer)
+        try:
+            while True:
+                args = await self._read_command(reader)
+                if args is None:
+                    break
+                self.commands += 1
+                writer.write(self._execute(args))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Run a minimal Redis-compatible server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+
+    server = await RespServer(args.host, args.port).start()
+    print(f"Listening on {server.url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
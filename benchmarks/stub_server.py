@@ -0,0 +1,110 @@
+# benchmarks/stub_server.py
+#
+# Minimal HTTP/1.1 keep-alive server used to stand in for api.github.com
+# (and later the OpenAI API) in local benchmarks. It is deliberately
+# dependency-free so benchmarks can run anywhere the app itself runs.
+
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class StubServer:
+    def __init__(self, handler, host="127.0.0.1", port=0, latency=0.0):
+        # handler(method, path, headers, body) -> (status, headers, body_bytes)
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.connections = 0
+        self.requests = 0
+        self._server = None
+        self._writers = set()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def _handle_connection(self, reader, writer):
+        self.connections += 1
+        self._writers.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, value = line.decode("latin-1").split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", "0"))
+                body = await reader.readexactly(length) if length else b""
+
+                self.requests += 1
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+
+                result = self.handler(method, path, headers, body)
+                if asyncio.iscoroutine(result):
+                    result = await result
+                status, response_headers, response_body = result
+
+                head = [f"HTTP/1.1 {status} OK"]
+                response_headers = {"content-type": "application/json", **response_headers}
+                response_headers["content-length"] = str(len(response_body))
+                head += [f"{name}: {value}" for name, value in response_headers.items()]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + response_body)
+                await writer.drain()
+
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError, asyncio.CancelledError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+def json_handler(payload, status=200, headers=None):
+    """Handler that answers every request with the same JSON payload."""
+    body = json.dumps(payload).encode()
+
+    def handler(method, path, request_headers, request_body):
+        return status, dict(headers or {}), body
+
+    return handler
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]